@@ -0,0 +1,121 @@
+"""
+记忆工具事件循环基准：并发发起多次 recall_memories（每次为不同用户，均未命中缓存），
+数据库查询以固定耗时的同步调用模拟，同时以 1ms 间隔的计时协程测量事件循环的延迟。
+对比数据库调用放入线程池（pool）与直接在事件循环中同步执行（inline，即改动前的做法）。
+
+需要在安装了 open-webui 的环境中运行。
+
+用法：python benchmarks/bench_memory.py --calls 50 --latency-ms 20 --concurrency 8
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "tools"))
+import memory_manager  # noqa: E402
+from open_webui.models.memories import MemoryModel  # noqa: E402
+
+
+def fake_db(latency, memories):
+    """返回模拟的 get_memories_by_user_id：阻塞 latency 秒后返回 memories 条记忆"""
+
+    def get_memories_by_user_id(user_id):
+        time.sleep(latency)
+        now = int(time.time())
+        return [
+            MemoryModel(
+                id=f"{user_id}-{i}",
+                user_id=user_id,
+                content=f"User fact {i}",
+                created_at=now - i,
+                updated_at=now - i,
+            )
+            for i in range(memories)
+        ]
+
+    return get_memories_by_user_id
+
+
+def quantile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def monitor(lags, stop, interval=0.001):
+    """每 interval 秒醒来一次，记录实际醒来时间比预期晚了多久"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run_case(mode, calls, concurrency):
+    """并发执行 calls 次 recall，返回总耗时、各次调用耗时与事件循环延迟"""
+    tools = memory_manager.Tools()
+    tools.valves.MAX_DB_CONCURRENCY = concurrency
+    if mode == "inline":
+
+        async def run(func, *args):
+            return func(*args)
+
+        tools._run = run
+
+    async def recall(i):
+        start = time.perf_counter()
+        await tools.recall_memories({"id": f"user{i}"})
+        return time.perf_counter() - start
+
+    lags, stop = [], asyncio.Event()
+    watcher = asyncio.ensure_future(monitor(lags, stop))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*[recall(i) for i in range(calls)])
+    total = time.perf_counter() - start
+    stop.set()
+    await watcher
+    if tools._executor is not None:
+        tools._executor.shutdown()
+    return total, latencies, lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--memories", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", choices=["pool", "inline", "both"], default="both")
+    args = parser.parse_args()
+
+    memory_manager.Memories.get_memories_by_user_id = fake_db(
+        args.latency_ms / 1000, args.memories
+    )
+    modes = ["inline", "pool"] if args.mode == "both" else [args.mode]
+    print(
+        f"calls={args.calls} latency={args.latency_ms}ms "
+        f"memories={args.memories} concurrency={args.concurrency}"
+    )
+    print(
+        f"{'mode':<8}{'total(ms)':>11}{'call p50':>10}{'call p99':>10}"
+        f"{'lag p50':>10}{'lag p99':>10}{'lag max':>10}"
+    )
+    for mode in modes:
+        total, latencies, lags = asyncio.run(
+            run_case(mode, args.calls, args.concurrency)
+        )
+        print(
+            f"{mode:<8}{total * 1000:>11.1f}"
+            f"{quantile(latencies, 0.5) * 1000:>10.1f}"
+            f"{quantile(latencies, 0.99) * 1000:>10.1f}"
+            f"{quantile(lags, 0.5) * 1000:>10.2f}"
+            f"{quantile(lags, 0.99) * 1000:>10.2f}"
+            f"{max(lags, default=0) * 1000:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
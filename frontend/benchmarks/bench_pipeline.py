@@ -0,0 +1,170 @@
+"""
+财务分析流水线基准：在合成的客户报告文件夹上分别计时目录扫描、select_reports、load_reports、
+calc_indicators 与 to_markdown 各阶段，输出每阶段耗时、吞吐量（份报告/秒）与峰值 RSS。
+流水线在独立的解释器进程中运行，以获得干净的峰值 RSS。
+
+结果可保存为 JSON 基线，之后以 --baseline 对比，任一阶段变慢超过容差即以非零状态退出。
+
+用法：python benchmarks/bench_pipeline.py --years 10 --quarterly --rows 200 --save baseline.json
+      python benchmarks/bench_pipeline.py --years 10 --quarterly --rows 200 --baseline baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "tools"))
+from exim_tools import ReportParser  # noqa: E402
+from bench_reader import make_workbook, peak_rss_kib  # noqa: E402
+
+STAGES = ["scan", "select_reports", "load_reports", "calc_indicators", "to_markdown"]
+
+
+def make_client(path, years=10, quarterly=False, rows=200, cols=2, filler=0):
+    """生成一个客户文件夹：近 years 年的年报，quarterly 时另加每年四期季报，filler 为无关文件数"""
+    os.makedirs(path, exist_ok=True)
+    names = []
+    for year in range(2025 - years, 2025):
+        names.append(f"合成{year}年报.xlsx")
+        if quarterly:
+            names += [f"合成{year}{q}季报.xlsx" for q in "一二三四"]
+    for i, name in enumerate(names):
+        make_workbook(os.path.join(path, name), rows, cols, position="tail", seed=i)
+    for i in range(filler):
+        open(os.path.join(path, f"附件{i}.pdf"), "wb").close()
+    return len(names)
+
+
+def run_case(path, repeat, freq, cache):
+    """运行 repeat 次流水线，返回各阶段最短耗时、报告数与峰值 RSS"""
+    timings = {stage: [] for stage in STAGES}
+    cache_root = tempfile.mkdtemp() if cache != "off" else None
+    for i in range(repeat + (cache == "warm")):
+        cache_dir = cache_root
+        if cache == "cold":
+            cache_dir = os.path.join(cache_root, str(i))
+        marks = [time.perf_counter()]
+        parser = ReportParser(path, cache_dir)
+        marks.append(time.perf_counter())
+        selected_files = parser.select_reports(freq=freq)
+        marks.append(time.perf_counter())
+        data = parser.load_reports(selected_files)
+        marks.append(time.perf_counter())
+        table = parser.calc_indicators(data, list(selected_files))
+        marks.append(time.perf_counter())
+        parser.render(table, "markdown")
+        marks.append(time.perf_counter())
+        if cache == "warm" and i == 0:
+            # 第一轮只用于写入缓存
+            continue
+        for stage, start, end in zip(STAGES, marks, marks[1:]):
+            timings[stage].append(end - start)
+    return {
+        "reports": len(selected_files),
+        "seconds": {stage: min(values) for stage, values in timings.items()},
+        "peak_rss_kib": peak_rss_kib(),
+    }
+
+
+def compare(result, baseline, tolerance, min_delta=0.001):
+    """返回比基线慢超过 tolerance（比例）且超过 min_delta 秒的阶段：[(阶段, 基线耗时, 本次耗时), ...]
+
+    亚毫秒级的阶段计时抖动较大，min_delta 避免把噪声当作回退
+    """
+    regressions = []
+    for stage in STAGES:
+        before = baseline["seconds"].get(stage)
+        after = result["seconds"][stage]
+        if (
+            before is not None
+            and after > before * (1 + tolerance)
+            and after - before > min_delta
+        ):
+            regressions.append((stage, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--quarterly", action="store_true")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--cols", type=int, default=2)
+    parser.add_argument("--filler", type=int, default=0)
+    parser.add_argument(
+        "--freq", choices=["default", "annual", "quarter", "all"], default="all"
+    )
+    parser.add_argument("--cache", choices=["off", "cold", "warm"], default="off")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="将结果保存为 JSON 基线")
+    parser.add_argument("--baseline", help="与 JSON 基线对比")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.repeat, args.freq, args.cache)))
+        return
+
+    config = {
+        k: getattr(args, k)
+        for k in ["years", "quarterly", "rows", "cols", "filler", "freq", "cache"]
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "合成客户")
+        files = make_client(
+            path, args.years, args.quarterly, args.rows, args.cols, args.filler
+        )
+        proc = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                f"--case={path}",
+                f"--repeat={args.repeat}",
+                f"--freq={args.freq}",
+                f"--cache={args.cache}",
+            ],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    result = {"config": config, **json.loads(proc.stdout)}
+
+    print(" ".join(f"{k}={v}" for k, v in config.items()) + f" files={files}")
+    print(f"{'stage':<18}{'time(ms)':>10}{'reports/s':>12}")
+    for stage in STAGES:
+        elapsed = result["seconds"][stage]
+        throughput = result["reports"] / elapsed if elapsed else float("inf")
+        print(f"{stage:<18}{elapsed * 1000:>10.2f}{throughput:>12.1f}")
+    total = sum(result["seconds"].values())
+    print(f"{'total':<18}{total * 1000:>10.2f}{result['reports'] / total:>12.1f}")
+    print(f"peak rss: {result['peak_rss_kib'] / 1024:.1f}MiB")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("警告：基线的参数与本次运行不同")
+        regressions = compare(
+            result, baseline, args.tolerance, args.min_delta_ms / 1000
+        )
+        for stage, before, after in regressions:
+            print(
+                f"回退：{stage} {before * 1000:.2f}ms -> {after * 1000:.2f}ms "
+                f"(+{(after / before - 1) * 100:.0f}%)"
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+财报读取器基准：在合成的大行数报表上比较 pd.read_excel 全表读取与 ReportParser 精简读取器
+的耗时与内存峰值。每种读取方式在独立的解释器进程中运行，以获得干净的峰值 RSS。
+
+用法：python benchmarks/bench_reader.py --rows 5000 --cols 20 --position head
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "tools"))
+from exim_tools import ReportParser  # noqa: E402
+
+
+def make_workbook(path, rows=5000, cols=2, position="head", seed=0):
+    """生成三张报表的合成工作簿，所需科目放在表头（head）或表尾（tail），其余为填充科目"""
+    rng = np.random.default_rng(seed)
+    with pd.ExcelWriter(path) as writer:
+        for sheet, subjects in ReportParser.sheet_subjects.items():
+            required = [ReportParser.subject_map[s] for s in subjects]
+            filler = [f"填充科目{i}" for i in range(rows - len(required))]
+            labels = required + filler if position == "head" else filler + required
+            data = {"项目": labels}
+            for j in range(cols - 1):
+                data["期末余额" if j == 0 else f"附加列{j}"] = rng.uniform(
+                    1e7, 1e10, len(labels)
+                )
+            pd.DataFrame(data).to_excel(writer, sheet_name=sheet, index=False)
+
+
+def peak_rss_kib():
+    # Linux 下 ru_maxrss 会继承自 fork 出本进程的父进程，优先读取本进程自身的 VmHWM
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def read_full(path):
+    frames = pd.read_excel(path, sheet_name=ReportParser.sheet_names)
+    return {
+        sheet: frames[sheet].set_index(frames[sheet].columns[0]).iloc[:, 0]
+        for sheet in ReportParser.sheet_names
+    }
+
+
+def run_case(method, path, repeat):
+    read = read_full
+    if method != "read_excel":
+        read = ReportParser(os.path.dirname(path)).read_report
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read(path)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    read(path)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), traced_peak, peak_rss_kib()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--cols", type=int, default=2)
+    parser.add_argument("--position", choices=["head", "tail"], default="head")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.path, args.repeat)))
+        return
+
+    methods = ["read_excel", "read_report"]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "合成2024年报.xlsx")
+        make_workbook(path, args.rows, args.cols, args.position)
+        print(
+            f"rows={args.rows} cols={args.cols} position={args.position} "
+            f"size={os.path.getsize(path) / 1024:.0f}KiB"
+        )
+        print(
+            f"{'method':<12}{'time(ms)':>10}{'py peak(MiB)':>14}{'peak rss(MiB)':>15}"
+        )
+        for method in methods:
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    f"--case={method}",
+                    f"--path={path}",
+                    f"--repeat={args.repeat}",
+                ],
+                capture_output=True,
+                check=True,
+                text=True,
+            )
+            elapsed, traced_peak, max_rss = json.loads(result.stdout)
+            print(
+                f"{method:<12}{elapsed * 1000:>10.1f}"
+                f"{traced_peak / 2**20:>14.1f}{max_rss / 1024:>15.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+三表读取基准：在合成的客户文件夹上比较改动前每张报表各调用一次 pd.read_excel（per_sheet，
+每份报告打开并解析三次工作簿）与一次调用读取三张报表（single），并附 ReportParser.read_report
+当前读取器的耗时作参照。
+
+用法：python benchmarks/bench_sheets.py --reports 5 --rows 200 --repeat 10
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "tools"))
+from bench_reader import make_workbook  # noqa: E402
+from exim_tools import ReportParser  # noqa: E402
+
+
+def read_per_sheet(path):
+    """改动前的读取方式：每张报表单独调用一次 pd.read_excel"""
+    sheets = {}
+    for sheet in ReportParser.sheet_names:
+        df = pd.read_excel(path, sheet_name=sheet)
+        sheets[sheet] = df.set_index(df.columns[0]).iloc[:, 0]
+    return sheets
+
+
+def read_single(path):
+    """一次 pd.read_excel 调用同时读取三张报表"""
+    frames = pd.read_excel(path, sheet_name=ReportParser.sheet_names)
+    return {
+        sheet: frames[sheet].set_index(frames[sheet].columns[0]).iloc[:, 0]
+        for sheet in ReportParser.sheet_names
+    }
+
+
+def run_case(read, paths, repeat):
+    """读取全部报告 repeat 次，返回各次耗时与最后一次的读取结果"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = [read(path) for path in paths]
+        timings.append(time.perf_counter() - start)
+    return timings, data
+
+
+def same(parser, left, right):
+    """比较两种读取方式得到的所需科目金额是否一致，科目名统一为规范名后比较"""
+    for a, b in zip(left, right):
+        for sheet, labels in parser.required_labels.items():
+            values = [
+                series.rename(parser.resolve_label).reindex(sorted(labels)).tolist()
+                for series in (a[sheet], b[sheet])
+            ]
+            if values[0] != values[1]:
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--cols", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.reports):
+            path = os.path.join(tmp, f"合成{2024 - i}年报.xlsx")
+            make_workbook(path, args.rows, args.cols, position="tail", seed=i)
+            paths.append(path)
+        report_parser = ReportParser(tmp)
+        methods = {
+            "per_sheet": read_per_sheet,
+            "single": read_single,
+            "read_report": report_parser.read_report,
+        }
+        print(f"reports={args.reports} rows={args.rows} cols={args.cols} repeat={args.repeat}")
+        print(f"{'method':<12}{'median(ms)':>12}{'min(ms)':>10}{'speedup':>9}{'same':>6}")
+        baseline = baseline_data = None
+        for method, read in methods.items():
+            timings, data = run_case(read, paths, args.repeat)
+            median = statistics.median(timings)
+            if baseline is None:
+                baseline, baseline_data = median, data
+            print(
+                f"{method:<12}{median * 1000:>12.1f}{min(timings) * 1000:>10.1f}"
+                f"{baseline / median:>8.2f}x{str(same(report_parser, baseline_data, data)):>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
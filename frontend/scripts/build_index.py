@@ -0,0 +1,52 @@
+"""
+知识库索引离线构建：切分知识库文档、更新 BM25 倒排索引，并对内容变化了的条款批量向量化，结果写入
+缓存目录，供 knowledge_semantic_search 与 knowledge_retrieve 在查询时直接加载。知识库文档变化后
+重新运行即可，未变化的条款复用已有向量；运行中的工具会在下次检索时自动加载新的索引。
+
+各参数的默认值与 Tools.Valves 相同，需与 Open WebUI 中该工具的 KNOWLEDGE_DIR、CACHE_DIR 及向量
+模型设置保持一致，否则工具加载不到构建结果。
+
+用法：python scripts/build_index.py --knowledge-dir knowledge/exim
+"""
+
+import os
+import sys
+import time
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "..", "tools"))
+from exim_tools import Embedder, KnowledgeIndex, Tools, VectorIndex  # noqa: E402
+
+
+def main():
+    valves = Tools.Valves()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--knowledge-dir", default=valves.KNOWLEDGE_DIR)
+    parser.add_argument("--cache-dir", default=valves.CACHE_DIR)
+    parser.add_argument("--model", default=valves.EMBEDDING_MODEL)
+    parser.add_argument("--api-base", default=valves.EMBEDDING_API_BASE)
+    parser.add_argument("--api-key", default=valves.EMBEDDING_API_KEY)
+    parser.add_argument("--batch-size", type=int, default=valves.EMBEDDING_BATCH)
+    args = parser.parse_args()
+    if not args.knowledge_dir or not args.cache_dir:
+        parser.error("需要指定知识库目录与缓存目录")
+
+    start = time.perf_counter()
+    index = KnowledgeIndex(args.knowledge_dir, args.cache_dir)
+    index.refresh()
+    vectors = VectorIndex(
+        index.chunks,
+        args.cache_dir,
+        Embedder(args.model, args.api_base, args.api_key, args.batch_size),
+    )
+    embedded = vectors.build()
+    print(
+        f"documents={len(index.chunks.documents)} chunks={len(vectors.ids)} "
+        f"embedded={embedded} model={args.model} "
+        f"time={time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -8,118 +8,1300 @@ description: A series of tools for your job at Exim (China Export-Import Bank)
 
 import re
 import os
+import json
+import math
+import time
+import heapq
+import asyncio
+import difflib
+import hashlib
+import tempfile
+import threading
+import unicodedata
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+from pydantic import BaseModel, Field
+from typing import Callable, Any
+from functools import lru_cache
+from contextlib import contextmanager
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+class EventEmitter:
+    def __init__(self, event_emitter: Callable[[dict], Any] = None):
+        self.event_emitter = event_emitter
+
+    async def emit(self, description="Unknown state", status="in_progress", done=False):
+        """
+        Send a status event to the event emitter.
+
+        :param description: Event description
+        :param status: Event status
+        :param done: Whether the event is complete
+        """
+        if self.event_emitter:
+            await self.event_emitter(
+                {
+                    "type": "status",
+                    "data": {
+                        "status": status,
+                        "description": description,
+                        "done": done,
+                    },
+                }
+            )
+
+    async def message(self, content):
+        """
+        Append content to the chat message.
+
+        :param content: Message content
+        """
+        if self.event_emitter:
+            await self.event_emitter({"type": "message", "data": {"content": content}})
 
 
 class Tools:
-    def financial_report_analyze(self, path: str):
+    class Valves(BaseModel):
+        CACHE_DIR: str = Field(
+            default=os.path.join(os.path.expanduser("~"), ".cache", "exim_tools"),
+            description="Directory for parsed report cache, leave empty to disable.",
+        )
+        MAX_WORKERS: int = Field(
+            default=4, description="Number of processes for batch report analysis."
+        )
+        MAX_ROWS: int = Field(
+            default=30, description="Rows per page of returned tables, 0 for no limit."
+        )
+        MAX_COLS: int = Field(
+            default=8,
+            description="Report periods per page of returned tables, 0 for no limit.",
+        )
+        KNOWLEDGE_DIR: str = Field(
+            default="", description="Directory of exim regulation and note markdowns."
+        )
+        EMBEDDING_MODEL: str = Field(
+            default="BAAI/bge-small-zh-v1.5",
+            description="Embedding model for semantic knowledge search.",
+        )
+        EMBEDDING_API_BASE: str = Field(
+            default="",
+            description="OpenAI compatible API base (e.g. litellm proxy) for embeddings, leave empty to run the model locally on CPU.",
+        )
+        EMBEDDING_API_KEY: str = Field(
+            default="", description="API key for the embedding API."
+        )
+        EMBEDDING_BATCH: int = Field(
+            default=32, description="Number of chunks embedded per batch."
+        )
+        RETRIEVAL_CACHE_SIZE: int = Field(
+            default=256, description="Number of cached knowledge retrieval results."
+        )
+        RETRIEVAL_CACHE_TTL: int = Field(
+            default=3600, description="Seconds before a cached retrieval result expires."
+        )
+
+    def __init__(self):
+        self.valves = self.Valves()
+        self._executor = None
+        self._workers = 0
+        self._knowledge = None
+        self._vectors = None
+        self._retrievals = None
+        self._retrieval_owners = self._vector_failure = None
+        self._diff = None
+        self._notes = None
+        # 索引在工作线程中加载，避免并发的首次调用各自创建一份
+        self._index_lock = threading.RLock()
+
+    def _get_executor(self):
+        # 进程池在多次调用间复用，避免每次分析都重新创建子进程；MAX_WORKERS 变化时重建，
+        # 旧进程池在已提交的任务完成后退出
+        workers = max(1, self.valves.MAX_WORKERS)
+        if self._executor is None or self._workers != workers:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+            self._workers = workers
+        return self._executor
+
+    def __del__(self):
+        # 工具被重新加载或卸载时关闭进程池
+        executor = getattr(self, "_executor", None)
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _get_notes(self):
+        path = os.path.join(self.valves.KNOWLEDGE_DIR, ClientNotes.filename)
+        cache_dir = self.valves.CACHE_DIR or None
+        if self._notes is None or (self._notes.path, self._notes.cache_root) != (
+            path,
+            cache_dir,
+        ):
+            self._notes = ClientNotes(path, cache_dir)
+        return self._notes
+
+    def _get_knowledge(self):
+        # 索引常驻内存，只有知识库目录或缓存目录变化时才重新加载；首次加载需读取缓存文件，
+        # 应在工作线程中调用
+        path, cache_dir = self.valves.KNOWLEDGE_DIR, self.valves.CACHE_DIR or None
+        with self._index_lock:
+            if self._knowledge is None or (
+                self._knowledge.path,
+                self._knowledge.cache_dir,
+            ) != (path, cache_dir):
+                self._knowledge = KnowledgeIndex(path, cache_dir)
+            return self._knowledge
+
+    def _get_vectors(self):
+        # 与 BM25 索引共用同一个 ChunkStore，向量由 scripts/build_index.py 离线构建
+        embedder = Embedder(
+            self.valves.EMBEDDING_MODEL,
+            self.valves.EMBEDDING_API_BASE,
+            self.valves.EMBEDDING_API_KEY,
+            self.valves.EMBEDDING_BATCH,
+        )
+        with self._index_lock:
+            chunks = self._get_knowledge().chunks
+            cache_dir = self.valves.CACHE_DIR or None
+            if self._vectors is None or (
+                self._vectors.chunks,
+                self._vectors.cache_dir,
+                vars(self._vectors.embedder),
+            ) != (chunks, cache_dir, vars(embedder)):
+                self._vectors = VectorIndex(chunks, cache_dir, embedder)
+            return self._vectors
+
+    def _get_diff(self):
+        cache_dir = self.valves.CACHE_DIR or None
+        with self._index_lock:
+            if self._diff is None or self._diff.cache_root != cache_dir:
+                self._diff = ClauseDiff(cache_dir)
+            return self._diff
+
+    def _get_retrievals(self):
+        size, ttl = self.valves.RETRIEVAL_CACHE_SIZE, self.valves.RETRIEVAL_CACHE_TTL
+        if self._retrievals is None or (
+            self._retrievals.maxsize,
+            self._retrievals.ttl,
+        ) != (size, ttl):
+            self._retrievals = QueryCache(size, ttl)
+        return self._retrievals
+
+    def _retrieve(self, query, k):
+        """融合 BM25 与向量检索的排名，返回 (块 ID 列表, 是否命中缓存, 向量检索的错误信息)
+
+        向量索引尚未离线构建时只用 BM25；查询向量化失败（如模型不可用）时同样退化为只用 BM25，
+        且在缓存有效期内不再重试
+        """
+        index, vectors, cache = (
+            self._get_knowledge(),
+            self._get_vectors(),
+            self._get_retrievals(),
+        )
+        changed = index.refresh()
+        changed = vectors.sync() or changed
+        failure = self._vector_failure
+        error = None
+        if not vectors.ids:
+            vectors, error = None, VectorIndex.unbuilt
+        elif failure and failure[0] is vectors and time.monotonic() < failure[1]:
+            vectors, error = None, failure[2]
+        # 知识库变化或索引对象被重建（如更换了知识库目录、模型）时清空缓存
+        owners = (index, vectors)
+        if changed or self._retrieval_owners != owners:
+            cache.clear()
+            self._retrieval_owners = owners
+        key = (cache.normalize(query), k)
+        ranked = cache.get(key)
+        if ranked is not None:
+            return ranked, True, error
+        depth = max(4 * k, 20)
+        rankings = [[pid for pid, _ in index.search(query, depth)]]
+        if vectors is not None:
+            try:
+                rankings.append([pid for pid, _ in vectors.search(query, depth)])
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                self._vector_failure = (vectors, time.monotonic() + cache.ttl, error)
+                self._retrieval_owners = (index, None)
+        ranked = reciprocal_rank_fusion(rankings)[:k]
+        cache.put(key, ranked)
+        return ranked, False, error
+
+    async def _load_reports(self, parser, files, emitter):
+        """在进程池中解析报告，每完成一份推送一次进度；取消或出错时撤回尚未开始的任务"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+
+        async def load(key, report_path):
+            sheets = await loop.run_in_executor(
+                executor, parser.load_report, report_path
+            )
+            return key, sheets
+
+        tasks = [
+            asyncio.ensure_future(load(key, report_path))
+            for key, report_path in files.items()
+        ]
+        data = {}
+        try:
+            for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+                key, sheets = await task
+                data[key] = sheets
+                await emitter.emit(
+                    description=f"已解析 {done}/{len(tasks)} 份报告",
+                    status="parse_in_progress",
+                )
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return data
+
+    async def _analyze_portfolio(self, paths, emitter):
+        """在共享进程池中逐个客户分析，每完成一家推送一次进度；取消时撤回尚未开始的任务"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        cache_dir = self.valves.CACHE_DIR or None
+
+        async def analyze(path):
+            try:
+                table, error = await loop.run_in_executor(
+                    executor, analyze_client, path, cache_dir
+                )
+            except Exception as e:
+                # 子进程异常退出等情况也只影响当前客户
+                table, error = None, f"{type(e).__name__}: {e}"
+            return os.path.basename(path), table, error
+
+        tasks = [asyncio.ensure_future(analyze(path)) for path in paths]
+        tables, errors = {}, {}
+        try:
+            for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+                client, table, error = await task
+                if error is None:
+                    tables[client] = table
+                else:
+                    errors[client] = error
+                await emitter.emit(
+                    description=f"已分析 {done}/{len(tasks)} 家客户",
+                    status="analyze_in_progress",
+                )
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return combine_portfolio(paths, tables), errors
+
+    def _render_pages(self, table, output_format, precision, groups, title=None):
+        pages = ReportParser.render_pages(
+            table,
+            output_format,
+            precision,
+            groups,
+            max_rows=self.valves.MAX_ROWS or None,
+            max_cols=self.valves.MAX_COLS or None,
+        )
+        return [f"## {title}\n\n{page}" if title else page for page in pages]
+
+    def _select_page(self, pages, page):
+        if not 1 <= page <= len(pages):
+            raise ValueError(f"页码超出范围：共 {len(pages)} 页")
+        content = pages[page - 1]
+        if len(pages) > 1:
+            content += f"\n\n（第 {page}/{len(pages)} 页，可通过 page 参数查看其余页）"
+        return content
+
+    async def _deliver(self, pages, page, stream, emitter):
+        """返回第 page 页；stream 时把全部页依次作为消息推送给用户，只返回简短回执，避免内容重复"""
+        if not stream:
+            return self._select_page(pages, page)
+        for chunk in pages:
+            await emitter.message(chunk + "\n\n")
+        return (
+            f"已将结果分 {len(pages)} 页直接推送给用户，共 {sum(map(len, pages))} 字符，"
+            "无需重复输出表格内容"
+        )
+
+    async def financial_report_analyze(
+        self,
+        path: str,
+        output_format: str = "markdown",
+        groups: str = None,
+        precision: int = 2,
+        page: int = 1,
+        stream: bool = False,
+        __event_emitter__: Callable[[dict], Any] = None,
+    ):
         """当用户需要进行财务报告分析并给定一个财务报告路径时，你可以使用该工具，传入该路径，即可获取财务分析结果表格。
         :param path: 财务报告路径
+        :param output_format: 输出格式，"markdown"、"csv" 或 "json"
+        :param groups: 只返回的指标分组，以逗号分隔，可选 balance（资产负债）、turnover（营运周转）、profitability（盈利）、cash_flow（现金流），不填则返回全部
+        :param precision: 保留的小数位数
+        :param page: 表格较大时分页返回，指定返回第几页
+        :param stream: 是否把全部分页直接推送给用户，此时只返回推送回执
         :return: 财务报告表格
         """
-        parser = ReportParser(path)
-        table = parser()
-        table_markdown = table.to_markdown()
-        return table_markdown    
+        emitter = EventEmitter(__event_emitter__)
+        # 解析在进程池中进行，事件循环只负责调度与进度推送
+        try:
+            parser = await asyncio.to_thread(
+                ReportParser, path, self.valves.CACHE_DIR or None
+            )
+            selected_files = parser.select_reports()
+            data = await self._load_reports(parser, selected_files, emitter)
 
+            def render():
+                table = parser.calc_indicators(data, list(selected_files))
+                parser.persist(data, table)
+                return self._render_pages(table, output_format, precision, groups)
 
-class ReportParser:
-    def __init__(self, path: str):
-        self.path = path
-        files = os.listdir(self.path)
-        report_dict = {}
-        annual_report_pat = re.compile(r"([12]\d{3})年报")
-        quarterly_report_pat = re.compile(r"([12]\d{3})([一二三四])季报")
-        for f in files:
-            year_match = annual_report_pat.search(f)
-            quarter_match = quarterly_report_pat.search(f)
-            if year_match:
-                y = int(year_match.group(1))
-                report_dict[("annual", y)] = os.path.join(path, f)
-            elif quarter_match:
-                y = int(quarter_match.group(1))
-                q = quarter_match.group(2) + "季度"
-                report_dict[("quarter", y, q)] = os.path.join(path, f)
-        self.report_dict = report_dict
-
-    def select_reports(self):
-        year_list = sorted([k[1] for k in self.report_dict if k[0] == "annual"])
-        last_3_years = year_list[-3:]
-        selected = {
-            ("annual", year): self.report_dict[("annual", year)]
-            for year in last_3_years
-        }
-        quarter_candidates = [k for k in self.report_dict if k[0] == "quarter"]
-        if quarter_candidates:
-            quarters_sorted = sorted(
-                quarter_candidates, key=lambda t: (t[1], t[2]), reverse=True
+            pages = await asyncio.to_thread(render)
+            content = await self._deliver(pages, page, stream, emitter)
+        except asyncio.CancelledError:
+            await emitter.emit(
+                description="财务报告分析已取消", status="cancelled", done=True
             )
-            newest = quarters_sorted[0]
-            selected[newest] = self.report_dict[newest]
-            last_year_same = ("quarter", newest[1] - 1, newest[2])
-            if last_year_same in self.report_dict:
-                selected[last_year_same] = self.report_dict[last_year_same]
-        return selected
+            raise
+        except Exception as e:
+            message = f"财务报告分析失败：{type(e).__name__}: {e}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        await emitter.emit(
+            description=f"已完成 {len(selected_files)} 份报告的分析",
+            status="complete",
+            done=True,
+        )
+        return content
 
-    def load_reports(self, selected_files):
-        data = {}
-        for k, path in selected_files.items():
-            sheets = {}
-            for sheet in ["资产负债表", "利润表", "现金流量表"]:
-                df = pd.read_excel(path, sheet_name=sheet)
-                df = df.set_index(df.columns[0]).squeeze()
-                sheets[sheet] = df
-            data[k] = sheets
-        return data
+    async def financial_trend_analyze(
+        self,
+        path: str,
+        start_year: int = None,
+        end_year: int = None,
+        freq: str = "annual",
+        ttm: bool = False,
+        output_format: str = "markdown",
+        groups: str = None,
+        precision: int = 2,
+        page: int = 1,
+        stream: bool = False,
+        __event_emitter__: Callable[[dict], Any] = None,
+    ):
+        """当用户需要对某一客户进行多年财务趋势分析（如近十年年报、全部季报、同比增长、复合增长率）时，你可以使用该工具。
+        :param path: 财务报告路径
+        :param start_year: 起始年份（含），不填则不限
+        :param end_year: 截止年份（含），不填则不限
+        :param freq: "annual" 仅年报，"quarter" 仅季报，"all" 年报与季报
+        :param ttm: 是否将季报的利润与现金流量滚动为近十二个月口径
+        :param output_format: 输出格式，"markdown"、"csv" 或 "json"
+        :param groups: 只返回的指标分组，以逗号分隔，可选 balance（资产负债）、turnover（营运周转）、profitability（盈利）、cash_flow（现金流），不填则返回全部
+        :param precision: 保留的小数位数
+        :param page: 表格较大时分页返回，指定返回第几页
+        :param stream: 是否把全部分页直接推送给用户，此时只返回推送回执
+        :return: 财务指标趋势表格与增长率表格
+        """
+        emitter = EventEmitter(__event_emitter__)
+        try:
+            parser = await asyncio.to_thread(
+                ReportParser, path, self.valves.CACHE_DIR or None
+            )
+            selected_files = parser.select_reports(start_year, end_year, freq)
+            report_keys = list(selected_files)
+            # 只解析所选报告期以及计算同比、TTM 所需的报告期
+            files = {**selected_files, **parser.dependencies(report_keys, ttm)}
+            data = await self._load_reports(parser, files, emitter)
+
+            def render():
+                table = parser.calc_indicators(data, report_keys, ttm=ttm)
+                # TTM 口径的指标与单期指标不可比，只存储报表本身
+                parser.persist(data, None if ttm else table)
+                growth = parser.calc_growth(data, report_keys, ttm=ttm)
+                return self._render_pages(
+                    table, output_format, precision, groups, "财务指标"
+                ) + self._render_pages(growth, output_format, precision, groups, "增长率")
+
+            pages = await asyncio.to_thread(render)
+            content = await self._deliver(pages, page, stream, emitter)
+        except asyncio.CancelledError:
+            await emitter.emit(
+                description="财务趋势分析已取消", status="cancelled", done=True
+            )
+            raise
+        except Exception as e:
+            message = f"财务趋势分析失败：{type(e).__name__}: {e}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        await emitter.emit(
+            description=f"已完成 {len(report_keys)} 期报告的趋势分析",
+            status="complete",
+            done=True,
+        )
+        return content
+
+    async def portfolio_financial_analyze(
+        self,
+        path: str,
+        output_format: str = "markdown",
+        groups: str = None,
+        precision: int = 2,
+        page: int = 1,
+        stream: bool = False,
+        __event_emitter__: Callable[[dict], Any] = None,
+    ):
+        """当用户需要对多家客户（整个客户组合）批量进行财务分析时，你可以使用该工具，传入存放各客户财务报告文件夹的根目录，即可获取所有客户的财务分析结果表格。
+        :param path: 客户财务报告文件夹所在的根目录
+        :param output_format: 输出格式，"markdown"、"csv" 或 "json"
+        :param groups: 只返回的指标分组，以逗号分隔，可选 balance（资产负债）、turnover（营运周转）、profitability（盈利）、cash_flow（现金流），不填则返回全部
+        :param precision: 保留的小数位数
+        :param page: 表格较大时分页返回，指定返回第几页
+        :param stream: 是否把全部分页直接推送给用户，此时只返回推送回执
+        :return: 按客户汇总的财务报告表格
+        """
+        emitter = EventEmitter(__event_emitter__)
+        try:
+            paths = await asyncio.to_thread(client_folders, path)
+            table, errors = await self._analyze_portfolio(paths, emitter)
+            pages = await asyncio.to_thread(
+                self._render_pages, table, output_format, precision, groups
+            )
+            content = await self._deliver(pages, page, stream, emitter)
+        except asyncio.CancelledError:
+            await emitter.emit(
+                description="组合财务分析已取消", status="cancelled", done=True
+            )
+            raise
+        except Exception as e:
+            message = f"组合财务分析失败：{type(e).__name__}: {e}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        await emitter.emit(
+            description=f"已分析 {len(paths) - len(errors)}/{len(paths)} 家客户",
+            status="complete",
+            done=True,
+        )
+        if errors:
+            content += "\n\n以下客户解析失败：\n" + "\n".join(
+                f"- {client}: {error}" for client, error in errors.items()
+            )
+        return content
+
+    async def financial_screen(
+        self,
+        conditions: str,
+        output_format: str = "markdown",
+        __event_emitter__: Callable[[dict], Any] = None,
+    ):
+        """当用户需要按财务指标在所有已分析过的客户中进行筛选（如“资产负债率高于70%且经营活动现金净流量下降的客户”）时，你可以使用该工具。
+        :param conditions: 筛选条件，多个条件以分号或“且”分隔，每个条件形如 "资产负债率 > 70%"（百分比指标的 % 可省略）、"流动比率 < 1" 或 "经营活动现金净流量 下降"（与上年同期相比）；名称限于财务指标与总资产、营业收入、经营活动现金净流量等主要科目
+        :param output_format: 输出格式，"markdown"、"csv" 或 "json"
+        :return: 命中客户最新一期与上年同期的相关指标表格
+        """
+        emitter = EventEmitter(__event_emitter__)
+        if not self.valves.CACHE_DIR:
+            return "未设置缓存目录，没有可供筛选的财报数据"
+        try:
+            store = StatementStore(self.valves.CACHE_DIR)
+            table = await asyncio.to_thread(store.screen, conditions)
+            count = table.columns.get_level_values(0).nunique()
+            content = "没有符合条件的客户"
+            if count:
+                content = ReportParser.serialize(
+                    ReportParser.format_table(table, amount_precision=2), output_format
+                )
+        except Exception as e:
+            message = f"财务筛选失败：{type(e).__name__}: {e}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        await emitter.emit(
+            description=f"共有 {count} 家客户符合条件", status="complete", done=True
+        )
+        return content
+
+    async def knowledge_search(
+        self,
+        query: str,
+        k: int = 5,
+        __event_emitter__: Callable[[dict], Any] = None,
+    ):
+        """当用户询问进出口银行的规章制度（如出口卖方信贷、反洗钱、一级供应商贷款管理办法）或工作笔记中的内容时，你可以使用该工具检索最相关的条款，而不必阅读整份文件。
+        :param query: 检索内容，如 "贷款期限"、"客户尽职调查"
+        :param k: 返回的条款数量
+        :return: 最相关的条款原文及其 BM25 得分
+        """
+        emitter = EventEmitter(__event_emitter__)
+        if not self.valves.KNOWLEDGE_DIR:
+            return "未设置知识库目录"
+        try:
+
+            def search():
+                index = self._get_knowledge()
+                index.refresh()
+                return index, index.search(query, k)
+
+            index, hits = await asyncio.to_thread(search)
+        except Exception as e:
+            message = f"知识库检索失败：{type(e).__name__}: {e}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        await emitter.emit(
+            description=f"检索到 {len(hits)} 条相关条款", status="complete", done=True
+        )
+        if not hits:
+            return "没有找到相关条款"
+        return "\n\n".join(
+            format_chunk(index.chunks.chunks[pid], f"得分 {score:.2f}")
+            for pid, score in hits
+        )
+
+    async def knowledge_semantic_search(
+        self,
+        query: str,
+        k: int = 5,
+        __event_emitter__: Callable[[dict], Any] = None,
+    ):
+        """当用户用自然语言描述问题、关键词检索可能找不到（如同义表述 "借款能借多久"）时，你可以使用该工具按语义检索进出口银行规章制度与工作笔记中最相关的条款。
+        :param query: 用自然语言描述的问题
+        :param k: 返回的条款数量
+        :return: 最相关的条款原文及其相似度
+        """
+        emitter = EventEmitter(__event_emitter__)
+        if not self.valves.KNOWLEDGE_DIR:
+            return "未设置知识库目录"
+        try:
+
+            def search():
+                index = self._get_vectors()
+                self._get_knowledge().refresh()
+                index.sync()
+                if not index.ids:
+                    raise RuntimeError(VectorIndex.unbuilt)
+                return index, index.search(query, k)
+
+            index, hits = await asyncio.to_thread(search)
+        except Exception as e:
+            message = f"语义检索失败：{type(e).__name__}: {e}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        description = f"检索到 {len(hits)} 条相关条款"
+        if index.stale:
+            description += f"，{index.stale} 个条款有变化，重新构建向量索引前不参与语义检索"
+        await emitter.emit(description=description, status="complete", done=True)
+        if not hits:
+            return "没有找到相关条款"
+        return "\n\n".join(
+            format_chunk(index.chunks.chunks[pid], f"相似度 {score:.3f}")
+            for pid, score in hits
+        )
+
+    async def knowledge_retrieve(
+        self,
+        query: str,
+        k: int = 5,
+        __event_emitter__: Callable[[dict], Any] = None,
+    ):
+        """当用户询问进出口银行规章制度或工作笔记中的问题（如贷款期限、利率定价、反洗钱客户尽职调查）时，优先使用该工具，它同时按关键词和语义检索并融合两者的排名，返回最相关的条款。
+        :param query: 检索内容，关键词或自然语言问题均可
+        :param k: 返回的条款数量
+        :return: 最相关的条款原文
+        """
+        emitter = EventEmitter(__event_emitter__)
+        if not self.valves.KNOWLEDGE_DIR:
+            return "未设置知识库目录"
+        start = time.perf_counter()
+
+        def retrieve():
+            ranked, cached, error = self._retrieve(query, k)
+            chunks = self._get_knowledge().chunks.chunks
+            return [chunks[pid] for pid in ranked], cached, error
+
+        try:
+            ranked, cached, error = await asyncio.to_thread(retrieve)
+        except Exception as e:
+            message = f"知识库检索失败：{type(e).__name__}: {e}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        elapsed = (time.perf_counter() - start) * 1000
+        description = f"检索到 {len(ranked)} 条相关条款，用时 {elapsed:.2f}ms"
+        if cached:
+            description += "（缓存）"
+        if error:
+            description += f"，语义检索不可用，仅按关键词检索（{error}）"
+        await emitter.emit(description=description, status="complete", done=True)
+        if not ranked:
+            return "没有找到相关条款"
+        return "\n\n".join(
+            format_chunk(chunk, f"第 {rank} 名") for rank, chunk in enumerate(ranked, 1)
+        )
+
+    async def regulation_diff(
+        self,
+        old_document: str,
+        new_document: str,
+        __event_emitter__: Callable[[dict], Any] = None,
+    ):
+        """当用户询问某份规章新旧版本之间有哪些变化（如出口卖方信贷管理办法2023年修订与2025年修订的差异）时，你可以使用该工具，只返回新增、删除和修改的条款。
+        :param old_document: 旧版本的文件名关键词，多个关键词以空格分隔，如 "出口卖方信贷 2023"
+        :param new_document: 新版本的文件名关键词，如 "出口卖方信贷 2025"
+        :return: 新增、删除与修改的条款
+        """
+        emitter = EventEmitter(__event_emitter__)
+        if not self.valves.KNOWLEDGE_DIR:
+            return "未设置知识库目录"
+        try:
+
+            def compare():
+                index = self._get_knowledge()
+                index.refresh()
+                store, names = index.chunks, []
+                for keywords in (old_document, new_document):
+                    found = store.find_documents(keywords)
+                    if len(found) != 1:
+                        return store, found, keywords, None
+                    names.append(found[0])
+                return store, names, None, self._get_diff().get(store, *names)
+
+            store, names, keywords, result = await asyncio.to_thread(compare)
+        except Exception as e:
+            message = f"规章比较失败：{type(e).__name__}: {e}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        if result is None:
+            message = f"“{keywords}” 匹配到 {len(names)} 份文件，请调整关键词：{'、'.join(names)}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        await emitter.emit(
+            description=f"新增 {len(result['added'])} 条，删除 {len(result['removed'])} 条，"
+            f"修改 {len(result['modified'])} 条",
+            status="complete",
+            done=True,
+        )
+
+        sections = [
+            f"{os.path.splitext(names[0])[0]} → {os.path.splitext(names[1])[0]}："
+            f"新增 {len(result['added'])} 条，删除 {len(result['removed'])} 条，"
+            f"修改 {len(result['modified'])} 条，{result['unchanged']} 条未变"
+        ]
+        if result["added"]:
+            sections.append("## 新增条款")
+            sections += [format_chunk(store.chunks[i]) for i in result["added"]]
+        if result["removed"]:
+            sections.append("## 删除条款")
+            sections += [format_chunk(store.chunks[i]) for i in result["removed"]]
+        if result["modified"]:
+            sections.append("## 修改条款")
+            for old_id, new_id, _ in result["modified"]:
+                old, new = store.chunks[old_id], store.chunks[new_id]
+                lines = ClauseDiff.sentence_diff(old["text"], new["text"])
+                sections.append(
+                    f"### {old['article'] or old['title']} → {new['article'] or new['title']}"
+                    "\n\n```diff\n" + "\n".join(lines) + "\n```"
+                )
+        return "\n\n".join(sections)
+
+    async def client_lookup(
+        self, key: str, __event_emitter__: Callable[[dict], Any] = None
+    ):
+        """当用户询问某个客户的统一社会信用代码、评级、授信额度或贷款情况，或给出贷款账号、合同编号查询对应贷款时，你可以使用该工具。
+        :param key: 统一社会信用代码、合同编号、贷款账号或客户名称（可为简称）
+        :return: 客户基本信息、评级、授信与贷款明细
+        """
+        emitter = EventEmitter(__event_emitter__)
+        if not self.valves.KNOWLEDGE_DIR:
+            return "未设置知识库目录"
+        try:
+            notes = self._get_notes()
+            await asyncio.to_thread(notes.refresh)
+        except Exception as e:
+            message = f"客户查询失败：{type(e).__name__}: {e}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        found = notes.lookup(key)
+        if found is None:
+            candidates = notes.find_clients(key.strip())
+            if len(candidates) != 1:
+                return f"没有找到 {key}" + (
+                    f"，可能是：{'、'.join(candidates)}" if candidates else ""
+                )
+            found = notes.lookup(candidates[0])
+        client, loans = found
+        sections = [
+            f"## {client}",
+            notes.render(notes.clients.iloc[[notes.client_rows[client]]]),
+            "### 评级信息",
+            notes.render(notes.ratings[notes.ratings["client"] == client]),
+            "### 授信信息",
+            notes.render(notes.facilities[notes.facilities["client"] == client]),
+            "### 业务情况",
+            notes.render(loans) if len(loans) else "无",
+        ]
+        return "\n\n".join(sections)
+
+    async def loan_query(
+        self,
+        days: int = None,
+        client: str = None,
+        __event_emitter__: Callable[[dict], Any] = None,
+    ):
+        """当用户询问贷款余额合计，或未来若干天内到期的贷款时，你可以使用该工具。
+        :param days: 查询今天起多少天内到期的贷款，不填则返回余额合计
+        :param client: 只统计名称包含该关键词的客户，不填则统计全部客户
+        :return: 余额合计表格或即将到期的贷款表格
+        """
+        emitter = EventEmitter(__event_emitter__)
+        if not self.valves.KNOWLEDGE_DIR:
+            return "未设置知识库目录"
+        try:
+            notes = self._get_notes()
+            await asyncio.to_thread(notes.refresh)
+        except Exception as e:
+            message = f"贷款查询失败：{type(e).__name__}: {e}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        clients = notes.find_clients(client) if client else None
+        if days is not None:
+            loans = notes.maturing(days)
+            if clients is not None:
+                loans = loans[loans["client"].isin(clients)]
+            if loans.empty:
+                return f"未来 {days} 天内没有到期的贷款"
+            return f"未来 {days} 天内到期的贷款：\n\n{notes.render(loans)}"
+        totals = notes.total_balance(by_client=True).reset_index()
+        if clients is not None:
+            totals = totals[totals["client"].isin(clients)]
+        summary = totals.groupby("currency", sort=False)["balance"].sum().round(2)
+        return (
+            notes.render(totals)
+            + "\n\n合计："
+            + "，".join(f"{value}亿 {currency}" for currency, value in summary.items())
+        )
+
+    async def loan_calendar(
+        self,
+        months: int = 12,
+        days: int = 30,
+        client: str = None,
+        __event_emitter__: Callable[[dict], Any] = None,
+    ):
+        """当用户需要查看贷款到期安排、利率情况或做日常组合检查（如未来各月到期余额、各客户加权平均利率、近期到期贷款）时，你可以使用该工具。
+        :param months: 到期阶梯覆盖本月起的月份数
+        :param days: 列出今天起多少天内到期的贷款
+        :param client: 只统计名称包含该关键词的客户，不填则统计全部客户
+        :return: 到期阶梯、加权平均利率与近期到期贷款
+        """
+        emitter = EventEmitter(__event_emitter__)
+        if not self.valves.KNOWLEDGE_DIR:
+            return "未设置知识库目录"
+        try:
+            notes = self._get_notes()
+            await asyncio.to_thread(notes.refresh)
+        except Exception as e:
+            message = f"贷款日历生成失败：{type(e).__name__}: {e}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        clients = notes.find_clients(client) if client else None
+        ladder = notes.maturity_ladder(months, clients=clients)
+        ladder.index = ladder.index.strftime("%Y-%m")
+        loans = notes.maturing(days)
+        if clients is not None:
+            loans = loans[loans["client"].isin(clients)]
+        return "\n\n".join(
+            [
+                f"## 到期阶梯（未来 {months} 个月，单位：亿）",
+                notes.render(ladder.rename_axis("month").reset_index())
+                if len(ladder)
+                else "无",
+                "## 加权平均利率（不含保函）",
+                notes.render(notes.rate_summary(clients)),
+                f"## 未来 {days} 天内到期",
+                notes.render(loans) if len(loans) else "无",
+            ]
+        )
+
+    async def knowledge_clause(
+        self,
+        document: str,
+        article: str,
+        __event_emitter__: Callable[[dict], Any] = None,
+    ):
+        """当用户需要查看某份规章的某一条原文（如“2025年出口卖方信贷管理办法第十七条”）时，你可以使用该工具直接取出该条款。
+        :param document: 文件名关键词，多个关键词以空格分隔，如 "出口卖方信贷 2025"
+        :param article: 条款号，如 "第十七条" 或 "17"
+        :return: 条款原文
+        """
+        emitter = EventEmitter(__event_emitter__)
+        if not self.valves.KNOWLEDGE_DIR:
+            return "未设置知识库目录"
+        try:
+
+            def find():
+                index = self._get_knowledge()
+                index.refresh()
+                return index.chunks.find_article(document, article)
+
+            chunks = await asyncio.to_thread(find)
+        except Exception as e:
+            message = f"条款查询失败：{type(e).__name__}: {e}"
+            await emitter.emit(description=message, status="error", done=True)
+            return message
+        await emitter.emit(
+            description=f"找到 {len(chunks)} 条条款", status="complete", done=True
+        )
+        if not chunks:
+            return f"没有找到 {document} 的 {article}"
+        return "\n\n".join(format_chunk(chunk) for chunk in chunks)
 
-    def get_account(self, df, account, default=None):
-        subject_map = {
-            "总资产": "资产总计",
-            "净资产": "所有者权益（或股东权益）合计",
-            "长期借款": "长期借款",
-            "短期借款": "短期借款",
-            "一年内到期的长期借款": "一年内到期的非流动负债",
-            "应付票据": "应付票据",
-            "负债合计": "负债合计",
-            "流动资产合计": "流动资产合计",
-            "流动负债合计": "流动负债合计",
-            "存货": "存货",
-            "应收账款": "应收账款",
-            "其他应收款": "其他应收款",
-            "营业收入": "营业收入",
-            "营业成本": "营业成本",
-            "营业利润": "营业利润",
-            "利润总额": "利润总额",
-            "净利润": "净利润",
-            "经营活动现金净流量": "经营活动产生的现金流量净额",
-            "投资活动现金净流量": "投资活动产生的现金流量净额",
-            "筹资活动现金净流量": "筹资活动产生的现金流量净额",
-            "净现金流": "现金及现金等价物净增加额",
-            "经营活动现金流入": "经营活动现金流入小计",
+
+@contextmanager
+def atomic_write(path):
+    """先写入同目录下唯一命名的临时文件，退出时原子替换 path，出错时删除临时文件
+
+    临时文件由 tempfile.mkstemp 创建，同一进程内的多个线程并发写同一文件也互不干扰；
+    文件名以 "." 开头，不会被当作 parquet 数据集的一部分读取。
+    """
+    fd, tmp = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    os.close(fd)
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class ReportCache:
+    """财报解析结果的磁盘缓存
+
+    每个工作簿对应一个 parquet 文件（列：sheet, account, value），文件名取绝对路径的哈希，
+    源文件的 mtime 与 size 记录在 parquet 元数据中，任一变化即视为失效并重新解析。
+    tag 标识解析时所需的科目集合，科目映射变化后旧缓存同样失效。
+    """
+
+    def __init__(self, cache_dir: str, tag: str = ""):
+        self.cache_dir = os.path.join(cache_dir, "reports")
+        self.tag = tag
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _locate(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = {
+            "path": path,
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "tag": self.tag,
         }
-        return df.get(subject_map.get(account, account), default) / 1e8
+        name = hashlib.sha1(path.encode("utf-8")).hexdigest() + ".parquet"
+        return os.path.join(self.cache_dir, name), signature
 
-    def get_initial_balance(self, data, key):
-        if key[0] == "annual":
-            prev_key = ("annual", key[1] - 1)
-        elif key[0] == "quarter":
-            prev_key = ("annual", key[1] - 1)
-        else:
+    def get(self, path):
+        entry, signature = self._locate(path)
+        if not os.path.exists(entry):
             return None
-        if prev_key in data:
-            prev_sheet = data[prev_key]["资产负债表"]
-            return {
-                subj: self.get_account(prev_sheet, subj)
-                for subj in ["应收账款", "存货", "流动资产合计"]
-            }
-        else:
-            return {subj: None for subj in ["应收账款", "存货", "流动资产合计"]}
+        try:
+            table = pq.read_table(entry)
+        except (OSError, pa.ArrowException):
+            return None
+        meta = json.loads((table.schema.metadata or {}).get(b"exim_tools", b"{}"))
+        if meta.get("source") != signature:
+            return None
+        df = table.to_pandas()
+        sheets = {}
+        for sheet in meta["sheets"]:
+            part = df[df["sheet"] == sheet]
+            sheets[sheet] = pd.Series(
+                part["value"].to_numpy(dtype=float),
+                index=part["account"].to_numpy(dtype=object),
+            )
+        return sheets
+
+    def put(self, path, sheets):
+        entry, signature = self._locate(path)
+        df = pd.concat(
+            [
+                pd.DataFrame(
+                    {"sheet": sheet, "account": s.index.astype(str), "value": s.values}
+                )
+                for sheet, s in sheets.items()
+            ],
+            ignore_index=True,
+        )
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        meta = {"source": signature, "sheets": list(sheets)}
+        table = table.replace_schema_metadata(
+            {b"exim_tools": json.dumps(meta).encode("utf-8")}
+        )
+        # 先写临时文件再替换，避免并发读取到写了一半的缓存
+        with atomic_write(entry) as tmp:
+            pq.write_table(table, tmp)
+
+
+class ReportCatalog:
+    """报告目录的文件清单缓存
+
+    每个目录对应两个文件：<hash>.json 记录目录 mtime 与识别出的报告，<hash>.names.json 记录
+    所有文件名的识别结果（不是报告的记为 None）。目录 mtime 未变时只读取前者；变化时用
+    os.scandir 列出文件名，仅对新出现的文件名重新识别。
+    """
+
+    # 目录 mtime 精度有限（网络盘可达秒级），刚修改过的目录在写入清单后仍可能再次变化
+    racy_window_ns = 2_000_000_000
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.join(cache_dir, "catalogs")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _read(self, entry):
+        try:
+            with open(entry, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, entry, content):
+        with atomic_write(entry) as tmp, open(tmp, "w", encoding="utf-8") as f:
+            json.dump(content, f, ensure_ascii=False)
+
+    def scan(self, path, classify):
+        """返回目录中已识别报告的 [(文件名, 报告期键), ...]，顺序与目录遍历顺序一致"""
+        path = os.path.abspath(path)
+        base = os.path.join(
+            self.cache_dir, hashlib.sha1(path.encode("utf-8")).hexdigest()
+        )
+        mtime = os.stat(path).st_mtime_ns
+        catalog = self._read(base + ".json")
+        if catalog.get("path") == path and catalog.get("mtime") == mtime:
+            return [(f, tuple(key)) for f, key in catalog["reports"]]
+
+        known = self._read(base + ".names.json")
+        names = {}
+        with os.scandir(path) as it:
+            for item in it:
+                if item.name in known:
+                    names[item.name] = known[item.name]
+                else:
+                    names[item.name] = classify(item.name)
+        # 同一报告期有多个文件时保留遍历顺序中的最后一个
+        latest = {}
+        for f, key in names.items():
+            if key:
+                latest[tuple(key)] = f
+        reports = [(f, key) for key, f in latest.items()]
+        racy = time.time_ns() - mtime < self.racy_window_ns
+        self._write(base + ".names.json", names)
+        self._write(
+            base + ".json",
+            {"path": path, "mtime": None if racy else mtime, "reports": reports},
+        )
+        return reports
+
+
+class StatementStore:
+    """跨客户的财报列式存储
+
+    每个客户对应一个 parquet 文件（列：client, period, sheet, account, value），整个目录即一个
+    parquet 数据集。三张报表只存 ReportParser.subject_map 中科目的原始金额（读取报表时集齐这些
+    科目即停止，其余科目是否读到取决于行序，故不入库），计算出的指标存于 "财务指标" 表（金额
+    单位亿元、比率为小数）。同一客户再次写入时按 (period, sheet, account) 覆盖旧值。
+    """
+
+    indicator_sheet = "财务指标"
+    schema = pa.schema(
+        [
+            ("client", pa.string()),
+            ("period", pa.string()),
+            ("sheet", pa.string()),
+            ("account", pa.string()),
+            ("value", pa.float64()),
+        ]
+    )
+    condition_pat = re.compile(
+        r"^(?P<name>.+?)\s*(?:(?P<op>>=|<=|==|!=|>|<|=)\s*(?P<number>-?\d+(?:\.\d+)?)"
+        r"\s*(?P<percent>%)?|(?P<trend>下降|上升|减少|增加))$"
+    )
+    quarter_suffix = {"": 5, "一季度": 1, "二季度": 2, "三季度": 3, "四季度": 4}
+    # 各次分析各自创建实例，写入锁由同一进程内的全部实例共用
+    lock = threading.Lock()
+
+    def __init__(self, cache_dir: str):
+        self.root = os.path.join(cache_dir, "statements")
+        os.makedirs(self.root, exist_ok=True)
+
+    def write(self, client, frame):
+        """写入一个客户的长表（列：period, sheet, account, value）"""
+        keys = ["period", "sheet", "account"]
+        name = hashlib.sha1(client.encode("utf-8")).hexdigest() + ".parquet"
+        entry = os.path.join(self.root, name)
+        frame = frame[keys + ["value"]]
+        # 读取旧值、合并与替换需整体完成，否则并发写入同一客户时会丢失其中一次的结果
+        with self.lock:
+            if os.path.exists(entry):
+                try:
+                    old = pq.read_table(entry, columns=frame.columns.tolist())
+                    old = old.to_pandas()
+                except (OSError, pa.ArrowException):
+                    old = None
+                frame = pd.concat([frame, old], ignore_index=True)
+            # 新写入的值优先，同一报告期内科目重复时取第一次出现的值
+            frame = frame.drop_duplicates(keys, keep="first")
+            table = pa.Table.from_pandas(
+                frame.assign(client=client), schema=self.schema, preserve_index=False
+            )
+            with atomic_write(entry) as tmp:
+                pq.write_table(table, tmp)
+
+    def read(self, filters=None):
+        """读取全部客户的长表，filters 与 pyarrow.parquet.read_table 的 filters 相同"""
+        if not any(f.endswith(".parquet") for f in os.listdir(self.root)):
+            return self.schema.empty_table().to_pandas()
+        return pq.read_table(self.root, filters=filters, schema=self.schema).to_pandas()
+
+    @classmethod
+    def parse_conditions(cls, conditions):
+        """把 "资产负债率 > 70%; 经营活动现金净流量 下降" 解析为 [(名称, 运算符, 阈值), ...]
+
+        ReportParser.percent_rows 中的指标以小数存储，其阈值不带 % 时同样按百分数理解
+        """
+        parsed = []
+        for text in re.split(r"[;；,，\n]|且", conditions):
+            text = text.strip()
+            if not text:
+                continue
+            match = cls.condition_pat.match(text)
+            if match is None:
+                raise ValueError(f"无法识别的筛选条件：{text}")
+            if match["trend"]:
+                op = "<" if match["trend"] in ("下降", "减少") else ">"
+                parsed.append((match["name"], op, None))
+            else:
+                percent = match["percent"] or match["name"] in ReportParser.percent_rows
+                threshold = float(match["number"]) / (100 if percent else 1)
+                parsed.append((match["name"], match["op"].replace("==", "="), threshold))
+        if not parsed:
+            raise ValueError("筛选条件为空")
+        return parsed
+
+    def screen(self, conditions):
+        """按最新报告期筛选客户
+
+        每个客户取存储中最新的报告期；比较条件作用于最新一期的值，"下降"/"上升" 比较最新一期
+        与上年同期。名称只能是 ReportParser.indicator_names 中的指标，或 subject_map 中的科目
+        （简称或报表科目名均可，换算为亿元），其他科目不在存储中，直接报错。
+
+        :return: 以名称为行、(客户, 报告期) 为列的表格，包含命中客户的最新一期与上年同期
+        """
+        parsed = self.parse_conditions(conditions)
+        names = list(dict.fromkeys(name for name, _, _ in parsed))
+        indicators = [n for n in names if n in ReportParser.indicator_names]
+        subjects = {
+            ReportParser.label_aliases.get(label, label)
+            for label in map(normalize_label, ReportParser.subject_map.values())
+        }
+        labels, unsupported = {}, []
+        for n in names:
+            if n not in indicators:
+                label = normalize_label(ReportParser.subject_map.get(n, n))
+                label = ReportParser.label_aliases.get(label, label)
+                if label in subjects:
+                    labels[label] = n
+                else:
+                    unsupported.append(n)
+        if unsupported:
+            raise ValueError(
+                f"不支持按以下名称筛选：{'、'.join(unsupported)}，"
+                f"只能按财务指标或以下科目筛选：{'、'.join(ReportParser.subject_map)}"
+            )
+        filters = []
+        if indicators:
+            filters.append(
+                [("sheet", "=", self.indicator_sheet), ("account", "in", indicators)]
+            )
+        if labels:
+            filters.append(
+                [("sheet", "!=", self.indicator_sheet), ("account", "in", list(labels))]
+            )
+        frame = self.read(filters)
+        is_indicator = frame["sheet"] == self.indicator_sheet
+        frame["name"] = frame["account"].where(
+            is_indicator, frame["account"].map(labels)
+        )
+        frame["value"] = frame["value"].where(is_indicator, frame["value"] / 1e8)
+        missing = [n for n in names if n not in set(frame["name"])]
+        if missing:
+            raise ValueError(f"存储中没有以下科目或指标：{'、'.join(missing)}")
+
+        wide = frame.pivot_table(
+            index=["client", "period"], columns="name", values="value", aggfunc="first"
+        )
+        periods = wide.index.to_frame(index=False)
+        periods["year"] = periods["period"].str[:4].astype(int)
+        periods["order"] = periods["period"].str[5:].map(self.quarter_suffix)
+        latest = periods.sort_values(["client", "year", "order"]).groupby("client").tail(1)
+        latest["prior"] = (latest["year"] - 1).astype(str) + latest["period"].str[4:]
+        current = wide.reindex(pd.MultiIndex.from_frame(latest[["client", "period"]]))
+        prior = wide.reindex(pd.MultiIndex.from_frame(latest[["client", "prior"]]))
+
+        ops = {
+            ">": np.greater,
+            "<": np.less,
+            ">=": np.greater_equal,
+            "<=": np.less_equal,
+            "=": np.equal,
+            "!=": np.not_equal,
+        }
+        mask = np.ones(len(latest), dtype=bool)
+        for name, op, threshold in parsed:
+            other = prior[name].to_numpy() if threshold is None else threshold
+            mask &= ops[op](current[name].to_numpy(), other)
+
+        matched = latest[mask]
+        columns = pd.MultiIndex.from_arrays(
+            [
+                np.repeat(matched["client"].to_numpy(), 2),
+                np.column_stack([matched["period"], matched["prior"]]).ravel(),
+            ],
+            names=["客户", "报告期"],
+        )
+        columns = columns[columns.isin(wide.index)]
+        return wide.reindex(columns)[names].T.rename_axis("指标")
 
-    def calc_indicators(self, data, report_keys):
-        debt_accounts = ["短期借款", "长期借款", "一年内到期的长期借款"]
-        table = []
-        # 输出字段（中文）：用于最终表头
-        columns_zh = [
+
+LABEL_PREFIX_PAT = re.compile(
+    r"^(?:[一二三四五六七八九十]+、|\([一二三四五六七八九十\d]+\)|\d+[.、]|其中:|加:|减:)+"
+)
+LABEL_NOTE_PAT = re.compile(r"\([^()]*(?:填列|列示)[^()]*\)")
+
+
+@lru_cache(maxsize=8192)
+def normalize_label(label) -> str:
+    """科目名规范化：全角转半角、去除空白、序号与“其中：”“加：”等前缀以及“以“-”号填列”类注释"""
+    label = re.sub(r"\s+", "", unicodedata.normalize("NFKC", str(label)))
+    return LABEL_PREFIX_PAT.sub("", LABEL_NOTE_PAT.sub("", label))
+
+
+class ReportParser:
+    sheet_names = ["资产负债表", "利润表", "现金流量表"]
+    annual_report_pat = re.compile(r"([12]\d{3})年报")
+    quarter_order = {"一季度": 1, "二季度": 2, "三季度": 3, "四季度": 4}
+    quarterly_report_pat = re.compile(r"([12]\d{3})([一二三四])季报")
+    # 指标名 -> 报表科目名
+    subject_map = {
+        "总资产": "资产总计",
+        "净资产": "所有者权益（或股东权益）合计",
+        "长期借款": "长期借款",
+        "短期借款": "短期借款",
+        "一年内到期的长期借款": "一年内到期的非流动负债",
+        "应付票据": "应付票据",
+        "负债合计": "负债合计",
+        "流动资产合计": "流动资产合计",
+        "流动负债合计": "流动负债合计",
+        "存货": "存货",
+        "应收账款": "应收账款",
+        "其他应收款": "其他应收款",
+        "营业收入": "营业收入",
+        "营业成本": "营业成本",
+        "营业利润": "营业利润",
+        "利润总额": "利润总额",
+        "净利润": "净利润",
+        "经营活动现金净流量": "经营活动产生的现金流量净额",
+        "投资活动现金净流量": "投资活动产生的现金流量净额",
+        "筹资活动现金净流量": "筹资活动产生的现金流量净额",
+        "净现金流": "现金及现金等价物净增加额",
+        "经营活动现金流入": "经营活动现金流入小计",
+    }
+    # 报表科目名 -> 各家导出格式中的同义写法
+    label_synonyms = {
+        "资产总计": ["资产合计", "资产总额"],
+        "所有者权益（或股东权益）合计": [
+            "所有者权益合计",
+            "股东权益合计",
+            "所有者权益（股东权益）合计",
+        ],
+        "负债合计": ["负债总计", "负债总额"],
+        "一年内到期的非流动负债": ["一年内到期的长期负债"],
+        "经营活动产生的现金流量净额": ["经营活动现金流量净额"],
+        "投资活动产生的现金流量净额": ["投资活动现金流量净额"],
+        "筹资活动产生的现金流量净额": ["筹资活动现金流量净额"],
+        "现金及现金等价物净增加额": ["现金及现金等价物净增加（减少）额"],
+        "经营活动现金流入小计": ["经营活动现金流入合计"],
+    }
+    label_aliases = {
+        normalize_label(alias): normalize_label(label)
+        for label, aliases in label_synonyms.items()
+        for alias in aliases
+    }
+    sheet_subjects = {
+        "资产负债表": [
+            "总资产",
+            "净资产",
+            "长期借款",
+            "短期借款",
+            "一年内到期的长期借款",
+            "应付票据",
+            "负债合计",
+            "流动资产合计",
+            "流动负债合计",
+            "存货",
+            "应收账款",
+            "其他应收款",
+        ],
+        "利润表": ["营业收入", "营业成本", "营业利润", "利润总额", "净利润"],
+        "现金流量表": [
+            "经营活动现金净流量",
+            "投资活动现金净流量",
+            "筹资活动现金净流量",
+            "净现金流",
+            "经营活动现金流入",
+        ],
+    }
+    # 计算同比与年复合增长率的指标
+    growth_subjects = ["总资产", "净资产", "营业收入", "净利润", "经营活动现金净流量"]
+    # 输出字段（中文）：用于最终表头
+    indicator_names = [
+        "总资产",
+        "净资产",
+        "长期借款",
+        "短期借款",
+        "一年内到期的长期借款",
+        "应付票据",
+        "资产负债率",
+        "流动比率",
+        "速动比率",
+        "带息负债比率",
+        "应收账款",
+        "其他应收款",
+        "存货",
+        "应收账款周转率",
+        "存货周转次率",
+        "流动资产周转率",
+        "两金占流动资产比重",
+        "营业收入",
+        "营业利润",
+        "利润总额",
+        "净利润",
+        "销售利润率",
+        "净资产收益率",
+        "经营活动现金净流量",
+        "投资活动现金净流量",
+        "筹资活动现金净流量",
+        "净现金流",
+        "经营活动现金流入",
+        "经营活动现金流入/营业收入",
+        "盈余现金保障倍数",
+    ]
+    # 渲染时可按分组筛选的指标
+    indicator_groups = {
+        "balance": [
             "总资产",
             "净资产",
             "长期借款",
@@ -130,6 +1312,8 @@ class ReportParser:
             "流动比率",
             "速动比率",
             "带息负债比率",
+        ],
+        "turnover": [
             "应收账款",
             "其他应收款",
             "存货",
@@ -137,12 +1321,16 @@ class ReportParser:
             "存货周转次率",
             "流动资产周转率",
             "两金占流动资产比重",
+        ],
+        "profitability": [
             "营业收入",
             "营业利润",
             "利润总额",
             "净利润",
             "销售利润率",
             "净资产收益率",
+        ],
+        "cash_flow": [
             "经营活动现金净流量",
             "投资活动现金净流量",
             "筹资活动现金净流量",
@@ -150,123 +1338,1677 @@ class ReportParser:
             "经营活动现金流入",
             "经营活动现金流入/营业收入",
             "盈余现金保障倍数",
+        ],
+    }
+    # 指标均以 float64 计算与缓存，只在渲染时按以下分类格式化
+    percent_rows = [
+        "资产负债率",
+        "带息负债比率",
+        "两金占流动资产比重",
+        "销售利润率",
+        "净资产收益率",
+    ] + [f"{subject}同比" for subject in growth_subjects]
+    rounded_rows = [
+        "应收账款周转率",
+        "存货周转次率",
+        "流动资产周转率",
+        "经营活动现金流入/营业收入",
+        "盈余现金保障倍数",
+    ]
+
+    def __init__(self, path: str, cache_dir: str = None):
+        self.path = path
+        self.subject_labels = {
+            subject: self.resolve_label(label)
+            for subject, label in self.subject_map.items()
+        }
+        self.required_labels = {
+            sheet: {self.subject_labels[s] for s in subjects}
+            for sheet, subjects in self.sheet_subjects.items()
+        }
+        tag = hashlib.sha1(
+            json.dumps(
+                {k: sorted(v) for k, v in self.required_labels.items()},
+                ensure_ascii=False,
+            ).encode("utf-8")
+        ).hexdigest()
+        self.cache = ReportCache(cache_dir, tag=tag) if cache_dir else None
+        self.catalog = ReportCatalog(cache_dir) if cache_dir else None
+        self.store = StatementStore(cache_dir) if cache_dir else None
+        if self.catalog is None:
+            reports = [(f, self.classify_report(f)) for f in os.listdir(self.path)]
+        else:
+            reports = self.catalog.scan(self.path, self.classify_report)
+        self.report_dict = {
+            key: os.path.join(path, f) for f, key in reports if key is not None
+        }
+
+    def classify_report(self, filename):
+        """根据文件名识别报告期，年报返回 ("annual", 年)，季报返回 ("quarter", 年, 季度)"""
+        year_match = self.annual_report_pat.search(filename)
+        quarter_match = self.quarterly_report_pat.search(filename)
+        if year_match:
+            return ("annual", int(year_match.group(1)))
+        elif quarter_match:
+            y = int(quarter_match.group(1))
+            return ("quarter", y, quarter_match.group(2) + "季度")
+        return None
+
+    def period_order(self, key):
+        """报告期排序键：同一年内各季报在前、年报在后"""
+        if key[0] == "annual":
+            return (key[1], 5)
+        return (key[1], self.quarter_order[key[2]])
+
+    def select_reports(self, start=None, end=None, freq="default"):
+        """选择参与分析的报告
+
+        :param start: 起始年份（含），默认不限
+        :param end: 截止年份（含），默认不限
+        :param freq: "default" 为近三年年报加最新季报及上年同期季报，"annual" 为区间内全部年报，
+            "quarter" 为区间内全部季报，"all" 为区间内全部年报与季报
+        """
+        freqs = ("default", "annual", "quarter", "all")
+        if freq not in freqs:
+            raise ValueError(f"不支持的报告频率：{freq}，可选值：{'、'.join(freqs)}")
+        candidates = [
+            k
+            for k in self.report_dict
+            if (start is None or k[1] >= start) and (end is None or k[1] <= end)
         ]
-        for key in report_keys:
-            bal, inc, cash = (
-                data[key]["资产负债表"],
-                data[key]["利润表"],
-                data[key]["现金流量表"],
-            )
-            init_dict = self.get_initial_balance(data, key)
-            row = {}
-            # 以下均为中文指标名
-            row["总资产"] = self.get_account(bal, "总资产")
-            row["净资产"] = self.get_account(bal, "净资产")
-            row["长期借款"] = self.get_account(bal, "长期借款")
-            row["短期借款"] = self.get_account(bal, "短期借款")
-            row["一年内到期的长期借款"] = self.get_account(bal, "一年内到期的长期借款")
-            row["应付票据"] = self.get_account(bal, "应付票据")
-            total_assets = row["总资产"]
-            total_liabilities = self.get_account(bal, "负债合计")
-            row["资产负债率"] = (
-                f"{(total_liabilities / total_assets * 100):.2f}%"
-                if total_assets and total_liabilities
-                else None
+        if freq != "default":
+            kinds = {"annual": ["annual"], "quarter": ["quarter"]}.get(
+                freq, ["annual", "quarter"]
             )
-            current_assets_end = self.get_account(bal, "流动资产合计")
-            current_liabilities = self.get_account(bal, "流动负债合计")
-            row["流动比率"] = (
-                current_assets_end / current_liabilities
-                if current_liabilities
-                else None
+            keys = [k for k in candidates if k[0] in kinds]
+            return {k: self.report_dict[k] for k in sorted(keys, key=self.period_order)}
+
+        year_list = sorted([k[1] for k in candidates if k[0] == "annual"])
+        last_3_years = year_list[-3:]
+        selected = {
+            ("annual", year): self.report_dict[("annual", year)]
+            for year in last_3_years
+        }
+        quarter_candidates = [k for k in candidates if k[0] == "quarter"]
+        if quarter_candidates:
+            newest = max(quarter_candidates, key=self.period_order)
+            selected[newest] = self.report_dict[newest]
+            last_year_same = ("quarter", newest[1] - 1, newest[2])
+            if last_year_same in self.report_dict:
+                selected[last_year_same] = self.report_dict[last_year_same]
+        return selected
+
+    def prior_key(self, key):
+        """上年同期的报告期"""
+        return (key[0], key[1] - 1, *key[2:])
+
+    def dependencies(self, report_keys, ttm=False):
+        """计算同比（及 TTM）时需要额外加载、但不在结果中展示的报告期"""
+        keys = set(report_keys) | {self.prior_key(k) for k in report_keys}
+        if ttm:
+            keys |= {
+                dep
+                for k in list(keys)
+                if k[0] == "quarter"
+                for dep in [("annual", k[1] - 1), self.prior_key(k)]
+            }
+        return {
+            k: self.report_dict[k]
+            for k in sorted(keys - set(report_keys), key=self.period_order)
+            if k in self.report_dict
+        }
+
+    def read_report(self, path):
+        # 一次打开工作簿，逐行流式读取三张报表的前两列，不再物化整张表
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            return {
+                sheet: self.read_sheet(
+                    workbook[sheet].iter_rows(max_col=2, values_only=True), sheet
+                )
+                for sheet in self.sheet_names
+            }
+        finally:
+            workbook.close()
+
+    def read_sheet(self, rows, sheet):
+        """从行迭代器中取科目名列与数值列构造 Series，科目名统一为规范名，所需科目集齐后即停止读取"""
+        missing = set(self.required_labels[sheet])
+        labels, values = [], []
+        next(rows, None)  # 表头
+        for row in rows:
+            if not row or row[0] is None or row[0] == "":
+                continue
+            label = self.resolve_label(row[0])
+            labels.append(label)
+            values.append(row[1] if len(row) > 1 else None)
+            missing.discard(label)
+            if not missing:
+                break
+        return pd.Series(
+            pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(
+                dtype=float
+            ),
+            index=np.array(labels, dtype=object),
+        )
+
+    def load_report(self, path):
+        if self.cache is None:
+            return self.read_report(path)
+        sheets = self.cache.get(path)
+        if sheets is None:
+            sheets = self.read_report(path)
+            self.cache.put(path, sheets)
+        return sheets
+
+    def load_reports(self, selected_files):
+        return {k: self.load_report(path) for k, path in selected_files.items()}
+
+    def resolve_label(self, label):
+        label = normalize_label(label)
+        return self.label_aliases.get(label, label)
+
+    def report_name(self, key):
+        if key[0] == "annual":
+            return f"{key[1]}年"
+        return f"{key[1]}年{key[2]}"
+
+    def build_accounts(self, data):
+        """将所有已加载报告期对齐为 报告期 × 科目 的金额矩阵（单位：亿元）"""
+        subjects = [s for group in self.sheet_subjects.values() for s in group]
+        matrix = np.full((len(data), len(subjects)), np.nan)
+        offset = 0
+        for sheet, group in self.sheet_subjects.items():
+            series = [data[key][sheet] for key in data]
+            labels = np.concatenate([s.index.to_numpy() for s in series] or [[]])
+            values = np.concatenate([s.to_numpy(dtype=float) for s in series] or [[]])
+            periods = np.repeat(np.arange(len(series)), [len(s) for s in series])
+            cols = pd.Index([self.subject_labels[s] for s in group]).get_indexer(labels)
+            found = cols >= 0
+            # 同一报告期内科目名重复时取第一次出现的值
+            cells, first = np.unique(
+                periods[found] * len(group) + cols[found], return_index=True
             )
-            inventory_end = self.get_account(bal, "存货")
-            row["速动比率"] = (
-                (current_assets_end - inventory_end) / current_liabilities
-                if current_assets_end and inventory_end and current_liabilities
+            rows, cols = np.divmod(cells, len(group))
+            matrix[rows, offset + cols] = values[found][first]
+            offset += len(group)
+        return pd.DataFrame(
+            matrix / 1e8,
+            index=[self.report_name(key) for key in data],
+            columns=subjects,
+        )
+
+    def roll_ttm(self, accounts, data):
+        """将季报的利润表与现金流量表科目滚动为近十二个月（TTM）口径
+
+        季报为年初至今累计数，TTM = 本期累计 + 上年年报 - 上年同期累计；缺少上年数据的季报
+        无法滚动，其利润表与现金流量表科目置为 NaN。
+        """
+        flows = self.sheet_subjects["利润表"] + self.sheet_subjects["现金流量表"]
+        quarters = [k for k in data if k[0] == "quarter"]
+        if not quarters:
+            return accounts
+        accounts = accounts.copy()
+        names = [self.report_name(k) for k in quarters]
+        annual = accounts[flows].reindex(
+            [self.report_name(("annual", k[1] - 1)) for k in quarters]
+        )
+        prior = accounts[flows].reindex(
+            [self.report_name(self.prior_key(k)) for k in quarters]
+        )
+        accounts.loc[names, flows] = (
+            accounts.loc[names, flows].to_numpy() + annual.to_numpy() - prior.to_numpy()
+        )
+        return accounts
+
+    def calc_growth(self, data, report_keys, ttm=False):
+        """计算 growth_subjects 的同比增长率与区间内年报的年复合增长率"""
+        accounts = self.build_accounts(data)
+        if ttm:
+            accounts = self.roll_ttm(accounts, data)
+        accounts = accounts[self.growth_subjects]
+        names = [self.report_name(k) for k in report_keys]
+        current = accounts.reindex(names).to_numpy()
+        prior = accounts.reindex(
+            [self.report_name(self.prior_key(k)) for k in report_keys]
+        ).to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # 上年为负数时增长率没有意义
+            yoy = np.where(prior > 0, current / prior - 1, np.nan)
+            annual = [k for k in report_keys if k[0] == "annual"]
+            cagr = np.full(len(self.growth_subjects), np.nan)
+            if len(annual) >= 2:
+                first = accounts.loc[self.report_name(annual[0])]
+                last = accounts.loc[self.report_name(annual[-1])]
+                years = annual[-1][1] - annual[0][1]
+                cagr = np.where(
+                    (first > 0) & (last > 0), (last / first) ** (1 / years) - 1, np.nan
+                )
+        growth = pd.DataFrame(
+            yoy.T, index=[f"{s}同比" for s in self.growth_subjects], columns=names
+        )
+        growth["年复合增长率"] = cagr
+        return growth
+
+    def calc_indicators(self, data, report_keys, ttm=False):
+        accounts = self.build_accounts(data)
+        if ttm:
+            accounts = self.roll_ttm(accounts, data)
+        names = [self.report_name(key) for key in report_keys]
+        cur = dict(zip(accounts.columns, accounts.loc[names].to_numpy().T))
+        # 期初余额取上一年年报，通过把报告期平移到上年年报后与金额矩阵连接得到
+        prev_names = pd.Index(
+            [
+                self.report_name(("annual", key[1] - 1))
+                if ("annual", key[1] - 1) in data
                 else None
+                for key in report_keys
+            ]
+        )
+        has_prev = prev_names.notna()
+        prev = dict(zip(accounts.columns, accounts.reindex(prev_names).to_numpy().T))
+        # 上年无数据或为 0 时以期末余额代替期初余额
+        opening = {
+            col: np.where(has_prev & (prev[col] != 0), prev[col], cur[col])
+            for col in ["应收账款", "存货", "流动资产合计"]
+        }
+
+        # 条件判断与逐行计算时的真值语义一致：0 视为空，NaN 视为非空
+        nz = {col: values != 0 for col, values in cur.items()}
+        interest_debt = np.nansum(
+            [cur[k] for k in ["短期借款", "长期借款", "一年内到期的长期借款"]], axis=0
+        )
+        two_assets = np.where(nz["应收账款"], cur["应收账款"], 0) + np.where(
+            nz["其他应收款"], cur["其他应收款"], 0
+        )
+
+        def keep(values, mask=None):
+            values = np.asarray(values, dtype=float)
+            return values if mask is None else np.where(mask, values, np.nan)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rows = {
+                "资产负债率": keep(
+                    cur["负债合计"] / cur["总资产"], nz["总资产"] & nz["负债合计"]
+                ),
+                "流动比率": keep(
+                    cur["流动资产合计"] / cur["流动负债合计"], nz["流动负债合计"]
+                ),
+                "速动比率": keep(
+                    (cur["流动资产合计"] - cur["存货"]) / cur["流动负债合计"],
+                    nz["流动资产合计"] & nz["存货"] & nz["流动负债合计"],
+                ),
+                "带息负债比率": keep(interest_debt / cur["总资产"], nz["总资产"]),
+                "应收账款周转率": keep(
+                    cur["营业收入"] / ((opening["应收账款"] + cur["应收账款"]) / 2),
+                    (opening["应收账款"] != 0) & nz["应收账款"] & nz["营业收入"],
+                ),
+                "存货周转次率": keep(
+                    cur["营业成本"] / ((opening["存货"] + cur["存货"]) / 2),
+                    nz["营业成本"] & (opening["存货"] != 0) & nz["存货"],
+                ),
+                "流动资产周转率": keep(
+                    cur["营业收入"]
+                    / ((opening["流动资产合计"] + cur["流动资产合计"]) / 2),
+                    nz["营业收入"]
+                    & (opening["流动资产合计"] != 0)
+                    & nz["流动资产合计"],
+                ),
+                "两金占流动资产比重": keep(
+                    two_assets / cur["流动资产合计"], nz["流动资产合计"]
+                ),
+                "销售利润率": keep(
+                    cur["净利润"] / cur["营业收入"], nz["营业收入"] & nz["净利润"]
+                ),
+                "净资产收益率": keep(
+                    cur["净利润"] / cur["净资产"], nz["净资产"] & nz["净利润"]
+                ),
+                "经营活动现金流入/营业收入": keep(
+                    cur["经营活动现金流入"] / cur["营业收入"],
+                    nz["营业收入"] & nz["经营活动现金流入"],
+                ),
+                "盈余现金保障倍数": keep(
+                    cur["经营活动现金净流量"] / cur["净利润"],
+                    nz["净利润"] & nz["经营活动现金净流量"],
+                ),
+            }
+        table = [
+            rows[name] if name in rows else keep(cur[name])
+            for name in self.indicator_names
+        ]
+        if ttm:
+            names = [
+                f"{name}(TTM)" if key[0] == "quarter" else name
+                for key, name in zip(report_keys, names)
+            ]
+        return pd.DataFrame(np.vstack(table), index=self.indicator_names, columns=names)
+
+    @classmethod
+    def format_table(cls, table, precision=2, amount_precision=None):
+        """把数值表格转为展示用表格：百分比行格式化为 "x.xx%"，比率行四舍五入，缺失值为 None
+
+        :param amount_precision: 金额行保留的小数位数，默认不做舍入
+        """
+        labels = table.index.get_level_values(-1)
+        values = table.to_numpy(dtype=float)
+        formatted = values.astype(object)
+        rounded = labels.isin(cls.rounded_rows)
+        formatted[rounded] = np.round(values[rounded], precision)
+        if amount_precision is not None:
+            amounts = ~rounded & ~labels.isin(cls.percent_rows)
+            formatted[amounts] = np.round(values[amounts], amount_precision)
+        percent = labels.isin(cls.percent_rows)
+        formatted[percent] = np.vectorize(
+            lambda v: f"{v * 100:.{precision}f}%", otypes=[object]
+        )(values[percent])
+        formatted[np.isnan(values)] = None
+        return pd.DataFrame(formatted, index=table.index, columns=table.columns)
+
+    @classmethod
+    def render(cls, table, output_format="markdown", precision=2):
+        """将数值表格渲染为 markdown、csv 或 json 文本"""
+        return cls.serialize(cls.format_table(table, precision), output_format)
+
+    @classmethod
+    def render_pages(
+        cls,
+        table,
+        output_format="markdown",
+        precision=2,
+        groups=None,
+        max_rows=None,
+        max_cols=None,
+    ):
+        """按指标分组筛选行后整表格式化一次，再按行列预算切分为若干页分别渲染
+
+        :param groups: 指标分组名列表或以逗号分隔的字符串，见 indicator_groups，默认全部
+        :param max_rows: 每页最多行数，默认不限
+        :param max_cols: 每页最多报告期（列）数，默认不限
+        :return: 各页文本组成的列表，至少一页
+        """
+        formatted = cls.format_table(
+            cls.select_groups(table, groups), precision, amount_precision=precision
+        )
+        return [
+            cls.serialize(chunk, output_format)
+            for chunk in cls.paginate(formatted, max_rows, max_cols)
+        ]
+
+    @classmethod
+    def select_groups(cls, table, groups=None):
+        """只保留所选分组的指标行，增长率表中的 "X同比" 行随指标 X 归入同一分组"""
+        if not groups:
+            return table
+        if isinstance(groups, str):
+            groups = [g.strip() for g in re.split(r"[,，]", groups) if g.strip()]
+        unknown = [g for g in groups if g not in cls.indicator_groups]
+        if unknown:
+            raise ValueError(
+                f"未知的指标分组：{'、'.join(unknown)}，"
+                f"可选 {'、'.join(cls.indicator_groups)}"
             )
-            interest_debt = sum([(self.get_account(bal, k, 0)) for k in debt_accounts])
-            row["带息负债比率"] = (
-                f"{(interest_debt / total_assets * 100):.2f}%" if total_assets else None
-            )
-            row["应收账款"] = self.get_account(bal, "应收账款")
-            row["其他应收款"] = self.get_account(bal, "其他应收款")
-            row["存货"] = inventory_end
-            revenue = self.get_account(inc, "营业收入")
-            ar_open = init_dict["应收账款"] or row["应收账款"]
-            ar_end = row["应收账款"]
-            if ar_open and ar_end and revenue:
-                row["应收账款周转率"] = round(revenue / ((ar_open + ar_end) / 2), 2)
-            else:
-                row["应收账款周转率"] = None
-            op_cost = (
-                self.get_account(inc, "营业成本")
-                if self.get_account(inc, "营业成本")
-                else None
+        names = [name for g in groups for name in cls.indicator_groups[g]]
+        labels = table.index.get_level_values(-1).str.removesuffix("同比")
+        return table[labels.isin(names)]
+
+    @staticmethod
+    def paginate(table, max_rows=None, max_cols=None):
+        """按行列预算切分表格：先按列（报告期）分段，每段再按行分页，空表返回一页"""
+        n_rows, n_cols = table.shape
+        rows = max_rows or n_rows or 1
+        cols = max_cols or n_cols or 1
+        return [
+            table.iloc[i : i + rows, j : j + cols]
+            for j in range(0, max(n_cols, 1), cols)
+            for i in range(0, max(n_rows, 1), rows)
+        ]
+
+    @staticmethod
+    def serialize(formatted, output_format="markdown"):
+        """将格式化后的表格序列化为 markdown、csv 或 json 文本"""
+        if output_format == "markdown":
+            return formatted.to_markdown()
+        if output_format == "csv":
+            return formatted.to_csv()
+        if output_format == "json":
+            return formatted.to_json(orient="split", force_ascii=False)
+        raise ValueError(f"不支持的输出格式：{output_format}")
+
+    def persist(self, data, table=None):
+        """把已解析的报表与计算出的指标写入列式存储，客户名取报告文件夹名
+
+        报表只写入 subject_map 中的科目，见 StatementStore
+        """
+        if self.store is None:
+            return
+        frames = []
+        for key, sheets in data.items():
+            for sheet, series in sheets.items():
+                series = series[series.index.isin(self.required_labels[sheet])]
+                frames.append(
+                    pd.DataFrame(
+                        {
+                            "period": self.report_name(key),
+                            "sheet": sheet,
+                            "account": series.index.astype(str),
+                            "value": series.to_numpy(dtype=float),
+                        }
+                    )
+                )
+        if table is not None:
+            frames.append(
+                table.rename_axis("account")
+                .reset_index()
+                .melt(id_vars="account", var_name="period", value_name="value")
+                .assign(sheet=self.store.indicator_sheet)
             )
-            inv_open = init_dict["存货"] or inventory_end
-            if op_cost and inv_open and inventory_end:
-                row["存货周转次率"] = round(
-                    op_cost / ((inv_open + inventory_end) / 2), 2
+        if not frames:
+            return
+        client = os.path.basename(os.path.abspath(self.path))
+        self.store.write(client, pd.concat(frames, ignore_index=True))
+
+    def __call__(self):
+        selected_files = self.select_reports()
+        data = self.load_reports(selected_files)
+        indicators_df = self.calc_indicators(data, list(selected_files.keys()))
+        self.persist(data, indicators_df)
+        return indicators_df
+
+
+def analyze_client(path: str, cache_dir: str = None):
+    """分析单个客户文件夹，供进程池调用，异常以字符串形式返回而不抛出"""
+    try:
+        return ReportParser(path, cache_dir=cache_dir)(), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def client_folders(paths):
+    """客户文件夹列表原样返回；根目录则返回其下按名称排序的子文件夹"""
+    if isinstance(paths, str):
+        return sorted(entry.path for entry in os.scandir(paths) if entry.is_dir())
+    return list(paths)
+
+
+def combine_portfolio(paths, tables):
+    """把各客户的指标表按 paths 的顺序（而非完成顺序）拼接为以 (客户, 指标) 为行的汇总表"""
+    clients = [os.path.basename(path) for path in paths]
+    if not any(client in tables for client in clients):
+        return pd.DataFrame(index=pd.MultiIndex.from_tuples([], names=["客户", "指标"]))
+    return pd.concat(
+        {client: tables[client] for client in clients if client in tables},
+        names=["客户", "指标"],
+    )
+
+
+TOKEN_PAT = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]+|[a-z0-9]+")
+
+
+def tokenize(text):
+    """中文按相邻两字切分为二元组（单独一个汉字时保留单字），英文与数字按连续串切分"""
+    tokens = []
+    for run in TOKEN_PAT.findall(unicodedata.normalize("NFKC", text).lower()):
+        if len(run) > 1 and not run.isascii():
+            tokens += [run[i : i + 2] for i in range(len(run) - 1)]
+        else:
+            tokens.append(run)
+    return tokens
+
+
+CN_DIGITS = "零〇一二三四五六七八九十百"
+
+
+def cn_number(n: int) -> str:
+    """把 1-999 的整数写成中文数字，如 17 -> 十七、105 -> 一百零五"""
+    digits = "零一二三四五六七八九"
+    hundreds, rest = divmod(n, 100)
+    tens, ones = divmod(rest, 10)
+    text = f"{digits[hundreds]}百" if hundreds else ""
+    if tens:
+        text += f"{digits[tens]}十" if hundreds or tens > 1 else "十"
+    elif hundreds and ones:
+        text += "零"
+    return text + (digits[ones] if ones else "")
+
+
+def format_chunk(chunk, note=None):
+    """把块渲染为带出处标题的 markdown 段落"""
+    title = f"{os.path.splitext(chunk['doc'])[0]} {chunk['title']}".strip()
+    note = f"（{note}）" if note else ""
+    return f"### {title}{note}\n\n{chunk['text']}"
+
+
+class ChunkStore:
+    """知识库文档的条款级切分结果
+
+    规章按 第X章 / 第X节 / 第X条 切分，每条一个块，ID 为 "文档名#第X条"，同一文档内保持稳定；
+    第一个章或条之前的印发通知、修订说明为 "文档名#前言"。没有条款结构的文档（如工作笔记）按
+    markdown 标题切分，ID 为 "文档名#标题路径"。切分结果缓存为一个 parquet 文件，文档的 mtime
+    或大小变化时先比较内容哈希，只有内容确实变化的文档才重新切分。同一知识库只应有一个实例，
+    由 KnowledgeIndex 与 VectorIndex 共用，二者的刷新与检索都持有 lock。
+    """
+
+    columns = ["id", "doc", "chapter", "section", "article", "title", "text"]
+    heading_pat = re.compile(r"^(#{1,6})\s+(.*?)\s*$")
+    structure_pat = re.compile(rf"^第[{CN_DIGITS}\d]+([章节条])(?:\s+(.*?))?\s*$")
+    preamble = "前言"
+
+    def __init__(self, path: str, cache_dir: str = None):
+        self.path = path
+        self.entry = None
+        if cache_dir:
+            os.makedirs(os.path.join(cache_dir, "knowledge"), exist_ok=True)
+            self.entry = os.path.join(
+                cache_dir,
+                "knowledge",
+                hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+                + ".chunks.parquet",
+            )
+        self.documents, self.chunks = {}, {}
+        self.lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        if self.entry is None or not os.path.exists(self.entry):
+            return
+        try:
+            table = pq.read_table(self.entry)
+        except (OSError, pa.ArrowException):
+            return
+        meta = json.loads((table.schema.metadata or {}).get(b"exim_tools", b"{}"))
+        self.documents = meta.get("documents", {})
+        self.chunks = {row["id"]: row for row in table.to_pylist()}
+
+    def _save(self):
+        if self.entry is None:
+            return
+        rows = list(self.chunks.values())
+        table = pa.table(
+            {col: pa.array([row[col] for row in rows], pa.string()) for col in self.columns}
+        )
+        table = table.replace_schema_metadata(
+            {
+                b"exim_tools": json.dumps(
+                    {"documents": self.documents}, ensure_ascii=False
+                ).encode("utf-8")
+            }
+        )
+        with atomic_write(self.entry) as tmp:
+            pq.write_table(table, tmp)
+
+    @classmethod
+    def split(cls, name, text):
+        """把一篇文档切分为块的列表，每块为 columns 各列组成的 dict"""
+        stem = os.path.splitext(name)[0]
+        chunks, body = [], []
+        state = {"chapter": "", "section": "", "article": "", "title": ""}
+        headings = []  # 按标题切分时的 [(级别, 标题), ...]
+        structured = any(
+            (m := cls.structure_pat.match(line.lstrip("#* ").rstrip("* ")))
+            and m.group(1) == "条"
+            for line in text.splitlines()
+        )
+
+        def flush():
+            content = "\n".join(body).strip()
+            body.clear()
+            if not content:
+                return
+            if structured:
+                label = state["article"] or state["section"] or state["chapter"]
+                title = " ".join(
+                    t
+                    for t in [state["chapter"], state["section"], state["title"]]
+                    if t
                 )
             else:
-                row["存货周转次率"] = None
-            curr_ast_open = init_dict["流动资产合计"] or current_assets_end
-            if revenue and curr_ast_open and current_assets_end:
-                row["流动资产周转率"] = round(
-                    revenue / ((curr_ast_open + current_assets_end) / 2), 2
-                )
+                label = "/".join(t for _, t in headings)
+                title = " ".join(t for _, t in headings)
+            chunks.append(
+                {
+                    "id": f"{stem}#{label or cls.preamble}",
+                    "doc": name,
+                    "chapter": state["chapter"],
+                    "section": state["section"],
+                    "article": state["article"],
+                    "title": title,
+                    "text": content,
+                }
+            )
+
+        for line in text.splitlines():
+            heading = cls.heading_pat.match(line)
+            marker = cls.structure_pat.match(line.lstrip("#* ").rstrip("* "))
+            if structured and marker and (heading or marker.group(1) == "条"):
+                flush()
+                label = line.lstrip("#* ").rstrip("* ").split()[0]
+                rest = marker.group(2) or ""
+                if marker.group(1) == "章":
+                    state.update(chapter=marker.group(0).strip(), section="")
+                    state.update(article="", title="")
+                elif marker.group(1) == "节":
+                    state.update(section=marker.group(0).strip(), article="", title="")
+                elif heading:
+                    state.update(article=label, title=marker.group(0).strip())
+                else:
+                    # 条款号与正文写在同一行
+                    state.update(article=label, title=label)
+                    body.append(rest)
+            elif not structured and heading:
+                flush()
+                level = len(heading.group(1))
+                while headings and headings[-1][0] >= level:
+                    headings.pop()
+                headings.append((level, heading.group(2)))
             else:
-                row["流动资产周转率"] = None
-            two_assets = (row["应收账款"] if row["应收账款"] else 0) + (
-                row["其他应收款"] if row["其他应收款"] else 0
+                body.append(line)
+        flush()
+
+        # 同一文档内 ID 重复（如同名标题）时依次加后缀
+        seen = Counter()
+        for chunk in chunks:
+            seen[chunk["id"]] += 1
+            if seen[chunk["id"]] > 1:
+                chunk["id"] += f"~{seen[chunk['id']]}"
+        return chunks
+
+    def refresh(self):
+        """重新切分内容变化了的文档，返回新增、修改或删除的文档名列表"""
+        current = {}
+        with os.scandir(self.path) as it:
+            for item in it:
+                if item.is_file() and item.name.endswith(".md"):
+                    stat = item.stat()
+                    current[item.name] = [stat.st_mtime_ns, stat.st_size]
+        changed, dirty = [], False
+        for name, signature in current.items():
+            document = self.documents.get(name)
+            if document and document["signature"] == signature:
+                continue
+            with open(os.path.join(self.path, name), encoding="utf-8") as f:
+                text = f.read()
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            dirty = True
+            if document and document["hash"] == digest:
+                # 仅 mtime 变化（如被重新保存），切分结果不变
+                document["signature"] = signature
+                continue
+            self._drop(name)
+            chunks = self.split(name, text)
+            self.chunks.update((chunk["id"], chunk) for chunk in chunks)
+            self.documents[name] = {
+                "signature": signature,
+                "hash": digest,
+                "ids": [chunk["id"] for chunk in chunks],
+            }
+            changed.append(name)
+        removed = [name for name in self.documents if name not in current]
+        for name in removed:
+            self._drop(name)
+        if dirty or removed:
+            self._save()
+        return changed + removed
+
+    def _drop(self, name):
+        document = self.documents.pop(name, None)
+        for chunk_id in document["ids"] if document else []:
+            self.chunks.pop(chunk_id, None)
+
+    def document(self, name):
+        """按原文顺序返回一篇文档的全部块"""
+        return [self.chunks[i] for i in self.documents[name]["ids"]]
+
+    def find_documents(self, keywords):
+        """返回文件名包含全部关键词（以空格分隔）的文档名"""
+        words = unicodedata.normalize("NFKC", keywords).split()
+        return [
+            name
+            for name in self.documents
+            if all(w in unicodedata.normalize("NFKC", name) for w in words)
+        ]
+
+    def find_article(self, keywords, article):
+        """按文档关键词与条款号（"第十七条"、"十七" 或 "17"）查找条款"""
+        article = article.strip().removeprefix("第").removesuffix("条")
+        if article.isdigit():
+            article = cn_number(int(article))
+        return [
+            chunk
+            for name in self.find_documents(keywords)
+            for chunk in self.document(name)
+            if chunk["article"] == f"第{article}条"
+        ]
+
+
+class ClauseDiff:
+    """同一规章两个版本之间的条款级差异
+
+    先按规范化正文的哈希做序列对齐（difflib.SequenceMatcher），对齐上的以及仅调整了位置或条款号
+    的条款视为未变；其余条款按字二元组集合的 Jaccard 相似度贪心配对，不低于 threshold 的视为
+    修改，未配对的为新增或删除。结果按两版内容哈希缓存在内存与缓存目录中，文档不变时直接复用。
+    """
+
+    threshold = 0.4
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_root = cache_dir
+        self.cache_dir = os.path.join(cache_dir, "knowledge", "diffs") if cache_dir else None
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self.memo = {}
+
+    @staticmethod
+    def fingerprint(chunk):
+        text = re.sub(r"\s+", "", unicodedata.normalize("NFKC", chunk["text"]))
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def sentence_diff(old_text, new_text):
+        """按句对齐两段条款正文，返回 "- 原句" / "+ 新句" 形式的差异行，空白差异忽略"""
+
+        def split(text):
+            return [s.strip() for s in re.split(r"(?<=[。；;\n])", text) if s.strip()]
+
+        def key(sentence):
+            return re.sub(r"\s+", "", unicodedata.normalize("NFKC", sentence))
+
+        a, b = split(old_text), split(new_text)
+        matcher = difflib.SequenceMatcher(
+            None, [key(x) for x in a], [key(x) for x in b], autojunk=False
+        )
+        lines = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag != "equal":
+                lines += [f"- {x}" for x in a[i1:i2]] + [f"+ {x}" for x in b[j1:j2]]
+        return lines
+
+    @classmethod
+    def compare(cls, old_chunks, new_chunks):
+        """返回 {"added": [新版块 ID], "removed": [旧版块 ID], "modified": [[旧 ID, 新 ID, 相似度]], "unchanged": 条数}"""
+        old_hashes = [cls.fingerprint(c) for c in old_chunks]
+        new_hashes = [cls.fingerprint(c) for c in new_chunks]
+        matcher = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+        old_rest, new_rest = set(range(len(old_chunks))), set(range(len(new_chunks)))
+        for block in matcher.get_matching_blocks():
+            old_rest -= set(range(block.a, block.a + block.size))
+            new_rest -= set(range(block.b, block.b + block.size))
+        # 内容未变、只是挪动了位置的条款
+        moved = {}
+        for j in sorted(new_rest):
+            moved.setdefault(new_hashes[j], []).append(j)
+        for i in sorted(old_rest):
+            if moved.get(old_hashes[i]):
+                new_rest.discard(moved[old_hashes[i]].pop(0))
+                old_rest.discard(i)
+
+        terms = {("old", i): set(tokenize(old_chunks[i]["text"])) for i in old_rest}
+        terms.update({("new", j): set(tokenize(new_chunks[j]["text"])) for j in new_rest})
+        candidates = []
+        for i in old_rest:
+            for j in new_rest:
+                a, b = terms[("old", i)], terms[("new", j)]
+                similarity = len(a & b) / len(a | b) if a | b else 1.0
+                if similarity >= cls.threshold:
+                    candidates.append((similarity, i, j))
+        modified = []
+        for similarity, i, j in sorted(candidates, reverse=True):
+            if i in old_rest and j in new_rest:
+                old_rest.discard(i)
+                new_rest.discard(j)
+                modified.append((i, j, similarity))
+        modified.sort(key=lambda item: item[1])
+        return {
+            "added": [new_chunks[j]["id"] for j in sorted(new_rest)],
+            "removed": [old_chunks[i]["id"] for i in sorted(old_rest)],
+            "modified": [
+                [old_chunks[i]["id"], new_chunks[j]["id"], round(similarity, 3)]
+                for i, j, similarity in modified
+            ],
+            "unchanged": len(old_chunks) - len(old_rest) - len(modified),
+        }
+
+    def get(self, store, old_name, new_name):
+        """比较 ChunkStore 中的两篇文档，前言不参与比较"""
+        key = hashlib.sha1(
+            f"{store.documents[old_name]['hash']}:{store.documents[new_name]['hash']}"
+            f":{self.threshold}".encode("utf-8")
+        ).hexdigest()
+        if key in self.memo:
+            return self.memo[key]
+        entry = os.path.join(self.cache_dir, key + ".json") if self.cache_dir else None
+        result = None
+        if entry:
+            try:
+                with open(entry, encoding="utf-8") as f:
+                    result = json.load(f)
+            except (OSError, ValueError):
+                pass
+        if result is None:
+            result = self.compare(
+                *[
+                    [
+                        c
+                        for c in store.document(name)
+                        if not c["id"].endswith(f"#{store.preamble}")
+                    ]
+                    for name in (old_name, new_name)
+                ]
             )
-            row["两金占流动资产比重"] = (
-                f"{(two_assets / current_assets_end * 100):.2f}%"
-                if current_assets_end
-                else None
+            if entry:
+                with atomic_write(entry) as tmp, open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(result, f, ensure_ascii=False)
+        self.memo[key] = result
+        return result
+
+
+class KnowledgeIndex:
+    """知识库的 BM25 倒排索引
+
+    以 ChunkStore 的块为检索单位，倒排表为 词 -> {块 ID: 词频}。索引持久化为缓存目录下的一个
+    json 文件，记录建索引时各文档的内容哈希；每次检索前刷新 ChunkStore，只对内容变化了的文档
+    更新倒排表。ChunkStore 由本索引创建并负责刷新，VectorIndex 通过 chunks 共用同一实例。
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, path: str, cache_dir: str = None):
+        self.path = path
+        self.cache_dir = cache_dir
+        self.chunks = ChunkStore(path, cache_dir)
+        self.entry = None
+        if cache_dir:
+            self.entry = os.path.join(
+                cache_dir,
+                "knowledge",
+                hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+                + ".bm25.json",
             )
-            row["营业收入"] = revenue
-            row["营业利润"] = self.get_account(inc, "营业利润")
-            row["利润总额"] = self.get_account(inc, "利润总额")
-            row["净利润"] = self.get_account(inc, "净利润")
-            row["销售利润率"] = (
-                f"{(row['净利润'] / revenue * 100):.2f}%"
-                if revenue and row["净利润"]
-                else None
+        self.documents, self.passages, self.postings = {}, {}, {}
+        self.lock = self.chunks.lock
+        self._load()
+
+    def _load(self):
+        if self.entry is None:
+            return
+        try:
+            with open(self.entry, encoding="utf-8") as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.documents = content["documents"]
+        self.passages = content["passages"]
+        self.postings = content["postings"]
+
+    def _save(self):
+        if self.entry is None:
+            return
+        with atomic_write(self.entry) as tmp, open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "documents": self.documents,
+                    "passages": self.passages,
+                    "postings": self.postings,
+                },
+                f,
+                ensure_ascii=False,
             )
-            row["净资产收益率"] = (
-                f"{(row['净利润'] / row['净资产'] * 100):.2f}%"
-                if row["净资产"] and row["净利润"]
-                else None
+
+    def _add(self, name):
+        for chunk in self.chunks.document(name):
+            terms = tokenize(
+                f"{os.path.splitext(name)[0]} {chunk['title']} {chunk['text']}"
             )
-            row["经营活动现金净流量"] = self.get_account(cash, "经营活动现金净流量")
-            row["投资活动现金净流量"] = self.get_account(cash, "投资活动现金净流量")
-            row["筹资活动现金净流量"] = self.get_account(cash, "筹资活动现金净流量")
-            row["净现金流"] = self.get_account(cash, "净现金流")
-            row["经营活动现金流入"] = self.get_account(cash, "经营活动现金流入")
-            row["经营活动现金流入/营业收入"] = (
-                round(row["经营活动现金流入"] / revenue, 2)
-                if revenue and row["经营活动现金流入"]
-                else None
+            counts = Counter(terms)
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[chunk["id"]] = tf
+            self.passages[chunk["id"]] = {
+                "doc": name,
+                "length": len(terms),
+                "terms": list(counts),
+            }
+        self.documents[name] = self.chunks.documents[name]["hash"]
+
+    def _remove(self, name):
+        if self.documents.pop(name, None) is None:
+            return
+        for pid in [pid for pid, p in self.passages.items() if p["doc"] == name]:
+            for term in self.passages.pop(pid)["terms"]:
+                postings = self.postings[term]
+                postings.pop(pid, None)
+                if not postings:
+                    del self.postings[term]
+
+    def refresh(self):
+        """刷新切分结果，只对内容变化了的文档更新倒排表，返回是否有变化"""
+        with self.lock:
+            self.chunks.refresh()
+            current = {
+                name: document["hash"]
+                for name, document in self.chunks.documents.items()
+            }
+            stale = [
+                name for name in self.documents | current
+                if self.documents.get(name) != current.get(name)
+            ]
+            if not stale:
+                return False
+            for name in stale:
+                self._remove(name)
+                if name in current:
+                    self._add(name)
+            self._save()
+        return True
+
+    def search(self, query, k=5):
+        """返回 BM25 得分最高的 k 个块：[(块 ID, 得分), ...]"""
+        with self.lock:
+            n = len(self.passages)
+            if n == 0:
+                return []
+            avgdl = sum(p["length"] for p in self.passages.values()) / n
+            scores = Counter()
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for pid, tf in postings.items():
+                    norm = 1 - self.b + self.b * self.passages[pid]["length"] / avgdl
+                    scores[pid] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+class Embedder:
+    """文本向量化，输出单位化的 float32 矩阵
+
+    设置了 api_base 时调用 OpenAI 兼容的 /embeddings 接口（如 litellm 代理），否则在 CPU 上运行
+    本地 sentence-transformers 模型；本地模型在进程内只加载一次。
+    """
+
+    _models = {}
+
+    def __init__(self, model: str, api_base: str = "", api_key: str = "", batch_size=32):
+        self.model = model
+        self.api_base = api_base.rstrip("/")
+        self.api_key = api_key
+        self.batch_size = max(1, batch_size)
+
+    def _encode(self, texts):
+        if self.api_base:
+            import requests
+
+            response = requests.post(
+                f"{self.api_base}/embeddings",
+                headers={"Authorization": f"Bearer {self.api_key}"}
+                if self.api_key
+                else {},
+                json={"model": self.model, "input": texts},
+                timeout=120,
             )
-            row["盈余现金保障倍数"] = (
-                round(row["经营活动现金净流量"] / row["净利润"], 2)
-                if row["净利润"] and row["经营活动现金净流量"]
-                else None
+            response.raise_for_status()
+            data = sorted(response.json()["data"], key=lambda item: item["index"])
+            return np.asarray([item["embedding"] for item in data], dtype=np.float32)
+        model = self._models.get(self.model)
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = self._models[self.model] = SentenceTransformer(
+                self.model, device="cpu"
+            )
+        return model.encode(
+            texts, batch_size=self.batch_size, convert_to_numpy=True
+        ).astype(np.float32)
+
+    def __call__(self, texts):
+        vectors = np.vstack(
+            [
+                self._encode(texts[i : i + self.batch_size])
+                for i in range(0, len(texts), self.batch_size)
+            ]
+        )
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class VectorIndex:
+    """知识库的向量索引
+
+    以 KnowledgeIndex 共用的 ChunkStore 的块为检索单位。向量由 build() 离线批量构建（见
+    scripts/build_index.py），只对内容哈希变化了的块重新向量化，其余块直接复用已有向量；
+    向量矩阵（单位化的 float32）保存为缓存目录下的 .npy 文件并以内存映射方式打开，同名 json
+    记录每行对应的块 ID 与块内容哈希、所用模型及构建时各文档的内容哈希。
+
+    查询时只调用 sync()：磁盘上的索引被重新构建后重新加载，构建之后内容变化了的块不参与
+    检索，直到下次构建，查询路径不做向量化。块数达到 ivf_threshold 时在内存中建立 IVF 粗聚类，
+    检索只扫描与查询最接近的 nprobe 个簇，否则对全部块精确计算内积。
+    """
+
+    ivf_threshold = 4096
+    nprobe = 8
+    unbuilt = "向量索引尚未构建，请设置 CACHE_DIR 并运行 scripts/build_index.py"
+
+    def __init__(
+        self, chunks: ChunkStore, cache_dir: str = None, embedder: Embedder = None
+    ):
+        self.chunks = chunks
+        self.path = chunks.path
+        self.cache_dir = cache_dir
+        self.embedder = embedder
+        self.entry = None
+        if cache_dir:
+            self.entry = os.path.join(
+                cache_dir,
+                "knowledge",
+                hashlib.sha1(os.path.abspath(self.path).encode("utf-8")).hexdigest()
+                + ".vectors",
+            )
+        self.documents, self.ids, self.hashes = {}, [], []
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.file = self.ivf = self.stamp = self.synced = self.valid = None
+        self.stale = 0
+        self.lock = chunks.lock
+        self._load()
+
+    def _load(self):
+        """加载磁盘上的索引，与已加载的相同时跳过，返回是否重新加载"""
+        if self.entry is None:
+            return False
+        try:
+            stamp = os.stat(f"{self.entry}.json").st_mtime_ns
+            if stamp == self.stamp:
+                return False
+            with open(f"{self.entry}.json", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["model"] != self.embedder.model:
+                return False
+            matrix = np.load(
+                os.path.join(os.path.dirname(self.entry), meta["file"]), mmap_mode="r"
+            )
+        except (OSError, ValueError, KeyError):
+            return False
+        if len(matrix) != len(meta["ids"]):
+            return False
+        self.documents, self.ids, self.hashes = (
+            meta["documents"],
+            meta["ids"],
+            meta["hashes"],
+        )
+        self.matrix, self.file, self.stamp = matrix, meta["file"], stamp
+        self._build_ivf()
+        return True
+
+    def _save(self):
+        if self.entry is None:
+            return
+        # 每次写入新文件名，避免覆盖仍被内存映射的旧文件
+        directory = os.path.dirname(self.entry)
+        file = "{}.{}.npy".format(
+            os.path.basename(self.entry),
+            hashlib.sha1("".join(self.hashes).encode("utf-8")).hexdigest()[:12],
+        )
+        with atomic_write(os.path.join(directory, file)) as tmp, open(tmp, "wb") as f:
+            np.save(f, self.matrix)
+        meta = f"{self.entry}.json"
+        with atomic_write(meta) as tmp, open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "model": self.embedder.model,
+                    "file": file,
+                    "documents": self.documents,
+                    "ids": self.ids,
+                    "hashes": self.hashes,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        self.stamp = os.stat(meta).st_mtime_ns
+        previous, self.file = self.file, file
+        self.matrix = np.load(os.path.join(directory, file), mmap_mode="r")
+        if previous and previous != file:
+            try:
+                os.remove(os.path.join(directory, previous))
+            except OSError:
+                pass
+
+    @staticmethod
+    def passage(chunk):
+        """块的向量化文本：文档名、标题与正文"""
+        stem = os.path.splitext(chunk["doc"])[0]
+        return f"{stem} {chunk['title']}\n{chunk['text']}"
+
+    def build(self):
+        """离线构建：按 ChunkStore 当前的切分结果，只对内容变化了的块重新向量化，返回向量化的块数"""
+        with self.lock:
+            current = {
+                name: document["hash"]
+                for name, document in self.chunks.documents.items()
+            }
+            if current == self.documents:
+                return 0
+            rows = dict(zip(self.hashes, range(len(self.hashes))))
+            ids, hashes, pending = [], [], {}
+            for name in current:
+                for chunk in self.chunks.document(name):
+                    text = self.passage(chunk)
+                    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+                    ids.append(chunk["id"])
+                    hashes.append(digest)
+                    if digest not in rows:
+                        pending.setdefault(digest, text)
+            sources = [self.matrix] if len(self.matrix) else []
+            if pending:
+                rows.update((h, len(self.hashes) + i) for i, h in enumerate(pending))
+                sources.append(self.embedder(list(pending.values())))
+            matrix = (
+                np.vstack(sources)[[rows[h] for h in hashes]]
+                if hashes
+                else np.empty((0, 0), dtype=np.float32)
+            )
+            self.documents, self.ids, self.hashes = current, ids, hashes
+            self.matrix = matrix
+            self._save()
+            self._build_ivf()
+            self.synced = None
+        return len(pending)
+
+    def sync(self):
+        """查询前调用：加载重新构建过的索引，并排除构建之后内容变化了的块，返回是否有变化
+
+        ChunkStore 需已由 KnowledgeIndex.refresh() 刷新；不做向量化。只有内容变化了的文档才逐块
+        比较内容哈希，其中未变的块仍参与检索
+        """
+        with self.lock:
+            current = {
+                name: document["hash"]
+                for name, document in self.chunks.documents.items()
+            }
+            if not self._load() and current == self.synced:
+                return False
+            self.synced = current
+            if current == self.documents:
+                self.valid, self.stale = None, 0
+                return True
+            unchanged, expected = set(), {}
+            for name, digest in current.items():
+                if self.documents.get(name) == digest:
+                    unchanged.update(self.chunks.documents[name]["ids"])
+                    continue
+                for chunk in self.chunks.document(name):
+                    text = self.passage(chunk)
+                    expected[chunk["id"]] = hashlib.sha1(
+                        text.encode("utf-8")
+                    ).hexdigest()
+            self.valid = np.fromiter(
+                (
+                    chunk_id in unchanged or expected.get(chunk_id) == digest
+                    for chunk_id, digest in zip(self.ids, self.hashes)
+                ),
+                dtype=bool,
+                count=len(self.ids),
             )
-            if key[0] == "annual":
-                report_name = f"{key[1]}年"
+            built = set(zip(self.ids, self.hashes))
+            self.stale = sum(item not in built for item in expected.items())
+        return True
+
+    def _build_ivf(self, iterations=10):
+        n = len(self.ids)
+        if n < self.ivf_threshold:
+            self.ivf = None
+            return
+        nlist = int(math.sqrt(n))
+        matrix = np.asarray(self.matrix)
+        rng = np.random.default_rng(0)
+        centroids = matrix[rng.choice(n, nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(matrix @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, matrix)
+            empty = np.bincount(assign, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = sums / np.maximum(
+                np.linalg.norm(sums, axis=1, keepdims=True), 1e-12
+            )
+        assign = np.argmax(matrix @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self.ivf = (centroids, order, bounds)
+
+    def search(self, query, k=5):
+        """返回与查询余弦相似度最高的 k 个块：[(块 ID, 相似度), ...]"""
+        if not self.ids:
+            return []
+        vector = self.embedder([query])[0]
+        with self.lock:
+            if self.ivf is None:
+                rows = np.arange(len(self.ids))
+                scores = self.matrix @ vector
             else:
-                report_name = f"{key[1]}年{key[2]}"
-            # 保证每列都是中文且顺序
-            table.append((report_name, [row.get(col) for col in columns_zh]))
-        # 用 DataFrame 的 index 指定为 columns_zh，
-        return pd.DataFrame(dict(table), index=columns_zh)
+                centroids, order, bounds = self.ivf
+                probe = np.argsort(centroids @ vector)[::-1][: self.nprobe]
+                rows = np.concatenate([order[bounds[c] : bounds[c + 1]] for c in probe])
+                scores = self.matrix[rows] @ vector
+            if self.valid is not None:
+                # 构建之后内容变化了的块，其向量已过期
+                keep = self.valid[rows]
+                rows, scores = rows[keep], scores[keep]
+            k = min(k, len(rows))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self.ids[rows[i]], float(scores[i])) for i in top]
 
-    def __call__(self):
-        selected_files = self.select_reports()
-        data = self.load_reports(selected_files)
-        indicators_df = self.calc_indicators(data, list(selected_files.keys()))
-        return indicators_df
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """倒数排名融合：各路排名中位于第 r 位（从 1 起）的块得分 1 / (k + r)，按得分之和排序"""
+    scores = Counter()
+    for ranking in rankings:
+        for rank, pid in enumerate(ranking, 1):
+            scores[pid] += 1 / (k + rank)
+    return sorted(scores, key=scores.__getitem__, reverse=True)
+
+
+class QueryCache:
+    """检索结果的 LRU 缓存：键为归一化后的查询，条目在 ttl 秒后过期，知识库变化时整体清空"""
+
+    punct_pat = re.compile(r"[\W_]+")
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def normalize(cls, query):
+        """全角转半角、小写，标点与空白统一为单个空格"""
+        query = unicodedata.normalize("NFKC", query).lower()
+        return cls.punct_pat.sub(" ", query).strip()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class ClientNotes:
+    """工作笔记中的客户台账
+
+    把工作笔记解析为四张表：clients（客户）、ratings（评级）、facilities（授信额度）与 loans
+    （贷款与保函明细），金额单位为亿元（美元业务为亿美元，见 currency 列），利率为小数。
+    各表缓存为缓存目录下的 parquet 文件，笔记的 mtime 或大小变化时比较内容哈希，内容变化才重新
+    解析。载入后按统一社会信用代码、合同编号、贷款账号建立哈希索引，查找为常数时间。
+
+    到期阶梯（ladder）与加权利率（rates）按客户预先汇总并随各表一起缓存；笔记变化时只重新汇总
+    贷款明细有变化的客户。
+    """
+
+    filename = "工作笔记.md"
+    tables = ["clients", "ratings", "facilities", "loans"]
+    derived = ["ladder", "rates"]
+    headers = {
+        "client": "客户",
+        "credit_code": "统一社会信用代码",
+        "legal_rep": "法定代表人",
+        "capital": "注册资本（万元）",
+        "start": "起始日",
+        "end": "截止日",
+        "r1": "初始评级R1",
+        "r2": "系统评级R2",
+        "r3": "最终认定信用等级R3",
+        "facility": "额度品种",
+        "limit": "额度（亿元）",
+        "used": "占用（亿元）",
+        "available": "可用（亿元）",
+        "contracted": "合同占用（亿元）",
+        "account": "贷款账号",
+        "contract": "合同编号",
+        "product": "产品类型",
+        "rate": "利率",
+        "balance": "余额（亿）",
+        "currency": "币种",
+        "value_date": "起息日",
+        "maturity": "到期日",
+        "month": "到期月份",
+        "interest": "年利息（亿）",
+    }
+    client_pat = re.compile(
+        r"统一社会信用代码：(?P<credit_code>\w+)；法定代表人：(?P<legal_rep>[^，,]+)[，,]"
+        r"注册资本：(?P<capital>[\d.]+)\s*万元"
+    )
+    period_pat = re.compile(r"时间范围：(\d{4}-\d{2}-\d{2})至(\d{4}-\d{2}-\d{2})")
+    rating_pat = re.compile(r"R1=(\d+).*?R2=(\d+).*?R3=(\d+)")
+    facility_pat = re.compile(
+        r"(?P<facility>\S+?)额度(?P<limit>[\d.]+)亿元、占用(?P<used>[\d.]+)(?:亿元)?、"
+        r"可用(?P<available>[\d.]+)(?:亿元)?、合同占用(?P<contracted>[\d.]+)(?:亿元)?"
+    )
+    loan_columns = {
+        "贷款账号": "account",
+        "合同编号": "contract",
+        "产品类型": "product",
+        "利率": "rate",
+        "余额": "balance",
+        "起息日": "value_date",
+        "到期日": "maturity",
+    }
+
+    def __init__(self, path: str, cache_dir: str = None):
+        self.path = path
+        self.cache_root = cache_dir
+        self.cache_dir = None
+        if cache_dir:
+            self.cache_dir = os.path.join(
+                cache_dir,
+                "notes",
+                hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest(),
+            )
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self.signature = self.digest = None
+        self.fingerprints = {}
+        self.ladder = self.rates = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, text):
+        """把笔记文本解析为 {表名: DataFrame}"""
+        rows = {name: [] for name in cls.tables}
+        client = section = header = None
+        for line in text.splitlines():
+            line = line.strip()
+            if line.startswith("### ") and not line.startswith("####"):
+                client, section = line[4:].strip(), None
+                rows["clients"].append({"client": client})
+                continue
+            if line.startswith("#### "):
+                section, header = line[5:].strip(), None
+                continue
+            if client is None or not line:
+                continue
+            if section is None and (match := cls.client_pat.search(line)):
+                rows["clients"][-1].update(
+                    credit_code=match["credit_code"],
+                    legal_rep=match["legal_rep"].strip(),
+                    capital=float(match["capital"]),
+                )
+            elif section in ("评级信息", "授信信息") and (
+                match := cls.period_pat.search(line)
+            ):
+                period = {"start": match.group(1), "end": match.group(2)}
+                if section == "评级信息":
+                    rows["ratings"].append({"client": client, **period})
+            elif section == "评级信息" and (match := cls.rating_pat.search(line)):
+                rows["ratings"][-1].update(
+                    r1=int(match.group(1)), r2=int(match.group(2)), r3=int(match.group(3))
+                )
+            elif section == "授信信息" and (match := cls.facility_pat.search(line)):
+                rows["facilities"].append(
+                    {
+                        "client": client,
+                        **period,
+                        "facility": match["facility"],
+                        **{
+                            k: float(match[k])
+                            for k in ["limit", "used", "available", "contracted"]
+                        },
+                    }
+                )
+            elif section == "业务情况" and line.startswith("|"):
+                cells = [c.strip() for c in line.strip("|").split("|")]
+                if header is None:
+                    header = [cls.loan_columns.get(c, c) for c in cells]
+                elif not set("".join(cells)) <= set("-: "):
+                    rows["loans"].append({"client": client, **dict(zip(header, cells))})
+
+        frames = {name: pd.DataFrame(rows[name]) for name in cls.tables}
+        clients = frames["clients"].reindex(
+            columns=["client", "credit_code", "legal_rep", "capital"]
+        )
+        ratings = frames["ratings"].reindex(
+            columns=["client", "start", "end", "r1", "r2", "r3"]
+        )
+        facilities = frames["facilities"].reindex(
+            columns=[
+                "client",
+                "start",
+                "end",
+                "facility",
+                "limit",
+                "used",
+                "available",
+                "contracted",
+            ]
+        )
+        loans = frames["loans"].reindex(columns=["client", *cls.loan_columns.values()])
+        amount = loans["balance"].str.extract(r"([\d.]+)\s*亿(.*)$")
+        loans = loans.assign(
+            rate=pd.to_numeric(loans["rate"].str.rstrip("%"), errors="coerce") / 100,
+            balance=pd.to_numeric(amount[0], errors="coerce"),
+            currency=amount[1].map({"元": "CNY", "美元": "USD"}).fillna(amount[1]),
+        )
+        for frame, cols in [
+            (ratings, ["start", "end"]),
+            (facilities, ["start", "end"]),
+            (loans, ["value_date", "maturity"]),
+        ]:
+            for col in cols:
+                frame[col] = pd.to_datetime(frame[col], errors="coerce")
+        return {
+            "clients": clients.astype({"capital": float}),
+            "ratings": ratings.astype({c: "Int64" for c in ["r1", "r2", "r3"]}),
+            "facilities": facilities.astype(
+                {c: float for c in ["limit", "used", "available", "contracted"]}
+            ),
+            "loans": loans.astype({"rate": float, "balance": float}),
+        }
+
+    def _read_cache(self):
+        try:
+            with open(os.path.join(self.cache_dir, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            frames = {
+                name: pd.read_parquet(os.path.join(self.cache_dir, f"{name}.parquet"))
+                for name in self.tables + self.derived
+            }
+        except (OSError, ValueError, pa.ArrowException):
+            return None, None
+        return meta, frames
+
+    def _write_cache(self, meta, frames):
+        for name, frame in frames.items():
+            with atomic_write(os.path.join(self.cache_dir, f"{name}.parquet")) as tmp:
+                frame.to_parquet(tmp, index=False)
+        # meta.json 最后写入，表文件写了一半时哈希对不上，下次会重新解析
+        entry = os.path.join(self.cache_dir, "meta.json")
+        with atomic_write(entry) as tmp, open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def refresh(self):
+        """笔记变化时重新载入各表并重建索引，返回是否有变化"""
+        stat = os.stat(self.path)
+        signature = [stat.st_mtime_ns, stat.st_size]
+        with self.lock:
+            if signature == self.signature:
+                return False
+            if self.digest is None and self.cache_dir:
+                meta, frames = self._read_cache()
+                if meta and meta["signature"] == signature:
+                    self.fingerprints = meta["fingerprints"]
+                    self._index(frames, signature, meta["hash"])
+                    return True
+                if meta:
+                    # 笔记在上次运行后被修改：以缓存的汇总为基础，只重新汇总变化了的客户
+                    self.fingerprints = meta["fingerprints"]
+                    self.ladder, self.rates = frames["ladder"], frames["rates"]
+            with open(self.path, encoding="utf-8") as f:
+                text = f.read()
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            if digest == self.digest:
+                # 只是被重新保存，内容未变
+                self.signature = signature
+                return False
+            frames = self.parse(text)
+            frames.update(self._summarize_changed(frames["loans"]))
+            if self.cache_dir:
+                meta = {
+                    "signature": signature,
+                    "hash": digest,
+                    "fingerprints": self.fingerprints,
+                }
+                self._write_cache(meta, frames)
+            self._index(frames, signature, digest)
+        return True
+
+    @classmethod
+    def summarize(cls, loans):
+        """按客户汇总到期阶梯（到期月 × 币种的余额）与加权平均利率，保函不计利息"""
+        month = loans["maturity"].dt.to_period("M").dt.start_time
+        ladder = (
+            loans.assign(month=month)
+            .groupby(["client", "month", "currency"], as_index=False, sort=False)[
+                "balance"
+            ]
+            .sum()
+        )
+        lending = loans[~loans["product"].str.contains("保函", na=False)]
+        rates = (
+            lending.assign(interest=lending["balance"] * lending["rate"])
+            .groupby(["client", "currency"], as_index=False, sort=False)[
+                ["balance", "interest"]
+            ]
+            .sum()
+        )
+        rates["rate"] = rates["interest"] / rates["balance"]
+        return {"ladder": ladder, "rates": rates}
+
+    def _summarize_changed(self, loans):
+        """只对贷款明细有变化的客户重新汇总，其余客户沿用上次的结果"""
+        row_hashes = pd.util.hash_pandas_object(loans, index=False).to_numpy()
+        fingerprints = {
+            client: hashlib.sha1(row_hashes[rows].tobytes()).hexdigest()
+            for client, rows in loans.groupby("client").indices.items()
+        }
+        previous = self.fingerprints if self.ladder is not None else {}
+        changed = [c for c, fp in fingerprints.items() if previous.get(c) != fp]
+        summary = self.summarize(loans[loans["client"].isin(changed)])
+        if previous:
+            kept = [c for c in fingerprints if c not in changed]
+            summary = {
+                name: pd.concat(
+                    [
+                        getattr(self, name)[getattr(self, name)["client"].isin(kept)],
+                        summary[name],
+                    ],
+                    ignore_index=True,
+                )
+                for name in self.derived
+            }
+        self.fingerprints = fingerprints
+        return summary
+
+    def _index(self, frames, signature, digest):
+        for name in self.tables + self.derived:
+            setattr(self, name, frames[name])
+        self.signature, self.digest = signature, digest
+        # 按到期日排序的位置，到期查询用二分查找
+        self.maturity_order = np.argsort(self.loans["maturity"].to_numpy(), kind="stable")
+        self.by_code = dict(zip(self.clients["credit_code"], self.clients["client"]))
+        self.client_rows = {c: i for i, c in enumerate(self.clients["client"])}
+        self.by_client = self.loans.groupby("client").indices
+        self.by_contract = self.loans.groupby("contract").indices
+        self.by_account = self.loans.groupby("account").indices
+
+    @classmethod
+    def render(cls, frame):
+        """渲染为 markdown 表格：日期为 YYYY-MM-DD，利率为百分数，列名为中文"""
+        frame = frame.copy()
+        for col in frame.columns:
+            if pd.api.types.is_datetime64_any_dtype(frame[col]):
+                frame[col] = frame[col].dt.strftime("%Y-%m-%d")
+            elif pd.api.types.is_float_dtype(frame[col]):
+                frame[col] = frame[col].round(4)
+        if "rate" in frame:
+            frame["rate"] = (frame["rate"] * 100).round(4).astype(str) + "%"
+        # 账号、信用代码等均为字符串，不做数字解析以免被当作数值对齐或改写
+        return frame.rename(columns=cls.headers).to_markdown(
+            index=False, disable_numparse=True
+        )
+
+    def lookup(self, key):
+        """按统一社会信用代码、合同编号、贷款账号或客户全称查找，返回 (客户名, 命中的贷款行) 或 None"""
+        key = key.strip()
+        for index in (self.by_contract, self.by_account):
+            if key in index:
+                loans = self.loans.iloc[index[key]]
+                return loans["client"].iloc[0], loans
+        client = self.by_code.get(key.upper(), key)
+        if client not in self.client_rows:
+            return None
+        return client, self.loans.iloc[self.by_client.get(client, [])]
+
+    def find_clients(self, keyword):
+        """客户名包含关键词的客户"""
+        return [name for name in self.clients["client"] if keyword in name]
+
+    def total_balance(self, by_client=False):
+        """余额合计，按币种（及客户）汇总"""
+        keys = ["client", "currency"] if by_client else ["currency"]
+        return self.loans.groupby(keys, sort=False)["balance"].sum()
+
+    def maturing(self, days, as_of=None):
+        """as_of（默认今天）起 days 天内到期的贷款，按到期日排序"""
+        as_of = pd.Timestamp(as_of or "today").normalize()
+        maturity = self.loans["maturity"].to_numpy()[self.maturity_order]
+        start = np.searchsorted(maturity, as_of.to_datetime64(), side="left")
+        end = np.searchsorted(
+            maturity, (as_of + pd.Timedelta(days=days)).to_datetime64(), side="right"
+        )
+        return self.loans.iloc[self.maturity_order[start:end]]
+
+    def maturity_ladder(self, months=12, as_of=None, clients=None):
+        """as_of 所在月份起 months 个月的到期阶梯：行为到期月份，列为币种"""
+        start = pd.Timestamp(as_of or "today").to_period("M").start_time
+        ladder = self.ladder
+        if clients is not None:
+            ladder = ladder[ladder["client"].isin(clients)]
+        ladder = ladder[
+            (ladder["month"] >= start)
+            & (ladder["month"] < start + pd.DateOffset(months=months))
+        ]
+        return ladder.pivot_table(
+            index="month",
+            columns="currency",
+            values="balance",
+            aggfunc="sum",
+            fill_value=0,
+        ).sort_index()
+
+    def rate_summary(self, clients=None):
+        """各客户及全部客户按币种的余额、年利息与加权平均利率"""
+        rates = self.rates
+        if clients is not None:
+            rates = rates[rates["client"].isin(clients)]
+        total = rates.groupby("currency", as_index=False, sort=False)[
+            ["balance", "interest"]
+        ].sum()
+        total["rate"] = total["interest"] / total["balance"]
+        total["client"] = "合计"
+        return pd.concat([rates, total], ignore_index=True)
@@ -18,10 +18,22 @@ You don't need to enable the memory switch,
 as this tool only requires access to its database.
 """
 
+import re
 import json
-from typing import Callable, Any, List
-
-from open_webui.models.memories import Memories
+import asyncio
+import math
+import time
+import uuid
+import heapq
+import bisect
+import hashlib
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Any, List, Optional
+
+from open_webui.internal.db import get_db
+from open_webui.models.memories import Memories, Memory, MemoryModel
 from pydantic import BaseModel, Field
 
 
@@ -50,9 +62,412 @@ class EventEmitter:
             )
 
 
+CJK = "\u3400-\u4dbf\u4e00-\u9fff"
+TOKEN_PATTERN = re.compile(rf"[{CJK}]+|[^\W_{CJK}]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into search terms: lowercase words, plus character bigrams for CJK runs.
+
+    :param text: Text to tokenize
+    :return: List of terms
+    """
+    terms = []
+    for run in TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).lower()):
+        if "\u3400" <= run[0] <= "\u9fff" and len(run) > 1:
+            terms.extend(run[i : i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return terms
+
+
+class MemoryIndex:
+    """
+    In-process BM25 index over one user's memories, keyed by memory ID.
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, memories=()):
+        self.contents = {}
+        self.lengths = {}
+        self.postings = {}
+        for memory in memories:
+            self.add(memory)
+
+    def add(self, memory):
+        """
+        Index a memory, replacing any previous version with the same ID.
+
+        :param memory: MemoryModel to index
+        """
+        self.remove(memory.id)
+        terms = Counter(tokenize(memory.content))
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[memory.id] = tf
+        self.contents[memory.id] = memory.content
+        self.lengths[memory.id] = sum(terms.values())
+
+    def remove(self, memory_id: str):
+        """
+        Drop a memory from the index if present.
+
+        :param memory_id: ID of the memory to drop
+        """
+        content = self.contents.pop(memory_id, None)
+        if content is None:
+            return
+        del self.lengths[memory_id]
+        for term in set(tokenize(content)):
+            postings = self.postings[term]
+            postings.pop(memory_id, None)
+            if not postings:
+                del self.postings[term]
+
+    def search(self, query: str, k: int = 5):
+        """
+        Rank memories against a query with BM25.
+
+        :param query: Search query
+        :param k: Number of results
+        :return: List of (memory ID, score), best first
+        """
+        n = len(self.contents)
+        if n == 0:
+            return []
+        avgdl = sum(self.lengths.values()) / n or 1
+        scores = Counter()
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for memory_id, tf in postings.items():
+                norm = 1 - self.b + self.b * self.lengths[memory_id] / avgdl
+                scores[memory_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+HANDLE_LENGTH = 8
+
+
+def memory_handle(memory_id: str, length: int = HANDLE_LENGTH) -> str:
+    """
+    Short, stable handle of a memory: the first hex digits of the SHA-1 of its ID.
+
+    :param memory_id: Memory ID
+    :param length: Number of hex digits, at most 40
+    :return: Handle string
+    """
+    return hashlib.sha1(memory_id.encode("utf-8")).hexdigest()[:length]
+
+
+class MemoryHandles:
+    """
+    Handle map of one user's memories.
+
+    A memory's handle is the shortest prefix of the SHA-1 of its ID that no
+    other memory of the user shares, at least HANDLE_LENGTH hex digits long,
+    so colliding memories get longer handles instead of shadowing each other.
+    Memories are grouped by their HANDLE_LENGTH-digit prefix, which keeps
+    collision checks and incremental updates cheap.
+    """
+
+    def __init__(self, memories=()):
+        self.groups = {}
+        for memory in memories:
+            self.add(memory)
+
+    def add(self, memory):
+        digest = memory_handle(memory.id, 40)
+        group = self.groups.setdefault(digest[:HANDLE_LENGTH], {})
+        group[memory.id] = (digest, memory)
+
+    def remove(self, memory_id: str):
+        prefix = memory_handle(memory_id)
+        group = self.groups.get(prefix)
+        if group is not None:
+            group.pop(memory_id, None)
+            if not group:
+                del self.groups[prefix]
+
+    def handle(self, memory_id: str) -> str:
+        """
+        :param memory_id: Memory ID
+        :return: Shortest unique handle of the memory
+        """
+        digest = memory_handle(memory_id, 40)
+        group = self.groups.get(digest[:HANDLE_LENGTH], {})
+        others = [other for key, (other, _) in group.items() if key != memory_id]
+        length = HANDLE_LENGTH
+        while any(other.startswith(digest[:length]) for other in others):
+            length += 1
+        return digest[:length]
+
+    def resolve(self, key: str) -> list:
+        """
+        Find the memories a handle (or full memory ID) refers to.
+
+        :param key: Handle, longer prefix of the SHA-1 or memory ID
+        :return: List of matching MemoryModel, more than one if the handle is ambiguous
+        """
+        handle = key.lower()
+        if len(handle) >= HANDLE_LENGTH:
+            group = self.groups.get(handle[:HANDLE_LENGTH], {})
+            matches = [m for digest, m in group.values() if digest.startswith(handle)]
+            if matches:
+                return matches
+        for memory_id in dict.fromkeys((key, handle)):
+            entry = self.groups.get(memory_handle(memory_id), {}).get(memory_id)
+            if entry is not None:
+                return [entry[1]]
+        return []
+
+
+class MemoryCache:
+    """
+    Per-user snapshot of memories sorted by creation time, expiring after ttl seconds.
+
+    Snapshots are replaced rather than mutated, so a list handed out earlier
+    keeps the positions it was resolved against. A write during a database load
+    marks the load stale, so a load that raced with a write is not cached. Each
+    snapshot carries a MemoryHandles map that writes keep up to date.
+
+    Expiry is checked against the current ttl, so lowering it also applies to
+    snapshots already cached, and a ttl of 0 disables caching. Expired
+    snapshots are dropped whenever a new one is cached.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self.entries = {}
+        # Users with a database load in flight, True once a write has made it stale
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, entry) -> bool:
+        return entry is not None and time.monotonic() - entry[0] < self.ttl
+
+    def get(self, user_id: str):
+        """
+        Return the cached snapshot of a user, or None if missing or expired.
+
+        :param user_id: User ID
+        :return: List of MemoryModel sorted by created_at, or None
+        """
+        entry = self.entries.get(user_id)
+        if not self._fresh(entry):
+            self.entries.pop(user_id, None)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def handles(self, user_id: str, memories) -> MemoryHandles:
+        """
+        Return the handle map of a snapshot returned by get() or put().
+
+        :param user_id: User ID
+        :param memories: Snapshot the handles should belong to
+        :return: MemoryHandles of the snapshot
+        """
+        entry = self.entries.get(user_id)
+        if entry is not None and entry[1] is memories:
+            return entry[2]
+        # Snapshot was not cached (e.g. a load raced with a write)
+        return MemoryHandles(memories)
+
+    def begin(self, user_id: str):
+        """
+        Mark the start of a database load of a user, ended by put() or discard().
+
+        :param user_id: User ID
+        """
+        self.pending.setdefault(user_id, False)
+
+    def discard(self, user_id: str):
+        """End a database load of a user that failed."""
+        self.pending.pop(user_id, None)
+
+    def prune(self):
+        """Drop every expired snapshot."""
+        for user_id, entry in list(self.entries.items()):
+            if not self._fresh(entry):
+                del self.entries[user_id]
+
+    def put(self, user_id: str, memories):
+        """
+        Cache a snapshot of a user's memories loaded since begin().
+
+        :param user_id: User ID
+        :param memories: List of MemoryModel
+        :return: The memories sorted by created_at
+        """
+        memories = sorted(memories, key=lambda m: m.created_at)
+        stale = self.pending.pop(user_id, False)
+        self.prune()
+        if not stale and self.ttl > 0:
+            handles = MemoryHandles(memories)
+            self.entries[user_id] = (time.monotonic(), memories, handles)
+        return memories
+
+    def _replace(self, user_id: str, update, memory_id: str, memory=None):
+        if user_id in self.pending:
+            self.pending[user_id] = True
+        entry = self.entries.get(user_id)
+        if entry is None:
+            return
+        entry[2].remove(memory_id)
+        if memory is not None:
+            entry[2].add(memory)
+        self.entries[user_id] = (entry[0], update(list(entry[1])), entry[2])
+
+    def add(self, user_id: str, memory):
+        """Write a newly inserted memory through to a cached snapshot."""
+
+        def update(memories):
+            keys = [m.created_at for m in memories]
+            memories.insert(bisect.bisect_right(keys, memory.created_at), memory)
+            return memories
+
+        self._replace(user_id, update, memory.id, memory)
+
+    def update(self, user_id: str, memory):
+        """Write an updated memory through to a cached snapshot."""
+        self._replace(
+            user_id,
+            lambda memories: [memory if m.id == memory.id else m for m in memories],
+            memory.id,
+            memory,
+        )
+
+    def remove(self, user_id: str, memory_id: str):
+        """Write a deletion through to a cached snapshot."""
+        self._replace(
+            user_id,
+            lambda memories: [m for m in memories if m.id != memory_id],
+            memory_id,
+        )
+
+    def stats(self) -> dict:
+        """
+        :return: Dict with hit/miss counters and number of cached users
+        """
+        return {"hits": self.hits, "misses": self.misses, "users": len(self.entries)}
+
+
+def _finish(db, results) -> list:
+    """
+    Commit a batch and convert its rows to MemoryModel.
+
+    If the commit fails, every item that was not rejected earlier gets the
+    database error instead.
+    """
+    try:
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        return [
+            r if isinstance(r, str) else f"Database error: {type(e).__name__}: {e}"
+            for r in results
+        ]
+    return [
+        MemoryModel.model_validate(r) if isinstance(r, Memory) else r for r in results
+    ]
+
+
+def insert_memories(user_id: str, contents: List[str]) -> list:
+    """
+    Insert several memories in a single transaction.
+
+    :param user_id: User ID
+    :param contents: Memory contents
+    :return: List aligned with contents, MemoryModel on success or an error message
+    """
+    now = int(time.time())
+    with get_db() as db:
+        results = []
+        for content in contents:
+            if not isinstance(content, str) or not content.strip():
+                results.append("Memory content is empty.")
+                continue
+            row = Memory(
+                id=str(uuid.uuid4()),
+                user_id=user_id,
+                content=content,
+                created_at=now,
+                updated_at=now,
+            )
+            db.add(row)
+            results.append(row)
+        return _finish(db, results)
+
+
+def update_memories(user_id: str, updates: List[tuple]) -> list:
+    """
+    Update several memories of a user in a single transaction.
+
+    :param user_id: User ID
+    :param updates: List of (memory ID, new content)
+    :return: List aligned with updates, MemoryModel on success or an error message
+    """
+    now = int(time.time())
+    with get_db() as db:
+        rows = {
+            row.id: row
+            for row in db.query(Memory).filter(
+                Memory.id.in_({memory_id for memory_id, _ in updates}),
+                Memory.user_id == user_id,
+            )
+        }
+        results = []
+        for memory_id, content in updates:
+            row = rows.get(memory_id)
+            if row is None:
+                results.append("Memory does not exist.")
+            elif not isinstance(content, str) or not content.strip():
+                results.append("Memory content is empty.")
+            else:
+                row.content = content
+                row.updated_at = now
+                results.append(row)
+        return _finish(db, results)
+
+
+def delete_memories(user_id: str, memory_ids: List[str]) -> list:
+    """
+    Delete several memories of a user in a single transaction.
+
+    :param user_id: User ID
+    :param memory_ids: IDs of the memories to delete
+    :return: List aligned with memory_ids, None on success or an error message
+    """
+    with get_db() as db:
+        found = {
+            memory_id
+            for (memory_id,) in db.query(Memory.id).filter(
+                Memory.id.in_(set(memory_ids)), Memory.user_id == user_id
+            )
+        }
+        if found:
+            db.query(Memory).filter(Memory.id.in_(found)).delete(
+                synchronize_session=False
+            )
+        results = [None if i in found else "Memory does not exist." for i in memory_ids]
+        return _finish(db, results)
+
+
 # Pydantic model for memory update operations
 class MemoryUpdate(BaseModel):
-    index: int = Field(..., description="Index of the memory entry (1-based)")
+    handle: Optional[str] = Field(
+        None, description="Handle of the memory entry, as shown by recall or search"
+    )
+    index: Optional[int] = Field(
+        None, description="Index of the memory entry (1-based), if no handle is given"
+    )
     content: str = Field(..., description="Updated content for the memory")
 
 
@@ -83,10 +498,132 @@ class Tools:
             default=True, description="Enable or disable memory usage."
         )
         DEBUG: bool = Field(default=True, description="Enable or disable debug mode.")
+        CACHE_STATS: bool = Field(
+            default=False,
+            description="Show memory cache hit/miss counters in the recall status.",
+        )
+        CACHE_TTL: int = Field(
+            default=300,
+            description="Seconds a user's memory list stays cached, 0 to disable.",
+        )
+        MAX_DB_CONCURRENCY: int = Field(
+            default=8,
+            description="Maximum number of database calls running at the same time.",
+        )
 
     def __init__(self):
         """Initialize the memory management tool."""
         self.valves = self.Valves()
+        self._cache = MemoryCache(self.valves.CACHE_TTL)
+        # Per-user search indexes, built lazily on first search
+        self._indexes = {}
+        # In-flight database loads, shared by concurrent cache misses of a user
+        self._loading = {}
+        self._executor = None
+        self._workers = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # The pool is reused across calls and rebuilt when MAX_DB_CONCURRENCY changes
+        workers = max(1, self.valves.MAX_DB_CONCURRENCY)
+        if self._executor is None or self._workers != workers:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="memory_manager"
+            )
+            self._workers = workers
+        return self._executor
+
+    async def _run(self, func, *args):
+        """
+        Run a blocking database call in the thread pool, keeping the event loop free.
+
+        :param func: Synchronous function to call
+        :return: Result of the function
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def _load_memories(self, user_id: str):
+        self._cache.begin(user_id)
+        try:
+            memories = await self._run(Memories.get_memories_by_user_id, user_id)
+        except BaseException:
+            self._cache.discard(user_id)
+            raise
+        finally:
+            self._loading.pop(user_id, None)
+        memories = self._cache.put(user_id, memories or [])
+        # Indexes live as long as their user's snapshot is cached
+        self._indexes = {
+            key: index
+            for key, index in self._indexes.items()
+            if key != user_id and key in self._cache.entries
+        }
+        return memories
+
+    async def _get_memories(self, user_id: str):
+        """
+        Return a user's memories sorted by creation time, from cache when fresh.
+
+        A database reload also drops the user's search index, so changes made
+        outside this tool reach search results within CACHE_TTL.
+
+        :param user_id: User ID
+        :return: List of MemoryModel sorted by created_at
+        """
+        self._cache.ttl = self.valves.CACHE_TTL
+        memories = self._cache.get(user_id)
+        if memories is not None:
+            return memories
+        loading = self._loading.get(user_id)
+        if loading is None:
+            loading = self._loading[user_id] = asyncio.ensure_future(
+                self._load_memories(user_id)
+            )
+        # Shielded so that one cancelled caller does not cancel the shared load
+        return await asyncio.shield(loading)
+
+    async def _get_index(self, user_id: str) -> MemoryIndex:
+        """
+        Return the search index of a user, building it on first use.
+
+        :param user_id: User ID
+        :return: MemoryIndex of the user
+        """
+        memories = await self._get_memories(user_id)
+        index = self._indexes.get(user_id)
+        if index is None:
+            index = self._indexes[user_id] = MemoryIndex(memories)
+        return index
+
+    async def _resolve(self, user_id: str, handles: List[str]) -> list:
+        """
+        Resolve memory handles (or full memory IDs) through the cached handle map.
+
+        :param user_id: User ID
+        :param handles: Handles to resolve
+        :return: List aligned with handles, MemoryModel or an error message
+        """
+        memories = await self._get_memories(user_id)
+        handle_map = self._cache.handles(user_id, memories)
+        resolved = []
+        for handle in handles:
+            matches = handle_map.resolve(str(handle).strip().strip("[]"))
+            if not matches:
+                resolved.append(f"Memory {handle} does not exist.")
+            elif len(matches) > 1:
+                candidates = ", ".join(f"[{handle_map.handle(m.id)}]" for m in matches)
+                resolved.append(
+                    f"Memory handle {handle} is ambiguous, use one of {candidates}."
+                )
+            else:
+                resolved.append(matches[0])
+        return resolved
+
+    def _cache_status(self) -> str:
+        stats = self._cache.stats()
+        return f" (cache hits {stats['hits']}, misses {stats['misses']})"
 
     async def recall_memories(
         self, __user__: dict = None, __event_emitter__: Callable[[dict], Any] = None
@@ -97,7 +634,10 @@ class Tools:
         IMPORTANT: Proactively check memories to enhance your responses!
         Don't wait for users to ask what you remember.
 
-        Returns memories in chronological order with index numbers.
+        Returns memories in chronological order with index numbers and
+        handles in brackets, e.g. "1. [3f2a9c1e] User likes blue". Prefer the
+        handle when updating or deleting a memory, it stays valid when other
+        memories are added or removed.
         Use when you need to check stored information, reference previous
         preferences, or build context for responses.
 
@@ -124,27 +664,94 @@ class Tools:
             done=False,
         )
 
-        user_memories = Memories.get_memories_by_user_id(user_id)
+        user_memories = await self._get_memories(user_id)
         if not user_memories:
             message = "No memory stored."
             await emitter.emit(description=message, status="recall_complete", done=True)
             return json.dumps({"message": message}, ensure_ascii=False)
 
+        handle_map = self._cache.handles(user_id, user_memories)
         content_list = [
-            f"{index}. {memory.content}"
-            for index, memory in enumerate(
-                sorted(user_memories, key=lambda m: m.created_at), start=1
-            )
+            f"{index}. [{handle_map.handle(memory.id)}] {memory.content}"
+            for index, memory in enumerate(user_memories, start=1)
         ]
 
+        description = f"{len(user_memories)} memories loaded"
+        if self.valves.CACHE_STATS:
+            description += self._cache_status()
         await emitter.emit(
-            description=f"{len(user_memories)} memories loaded",
+            description=description,
             status="recall_complete",
             done=True,
         )
 
         return f"Memories from the users memory vault: {content_list}"
 
+    async def search_memories(
+        self,
+        query: str,
+        k: int = 5,
+        __user__: dict = None,
+        __event_emitter__: Callable[[dict], Any] = None,
+    ) -> str:
+        """
+        Searches the user's memory vault and returns only the most relevant memories.
+
+        Prefer this over recall_memories when you are looking for something specific,
+        e.g. the user's preferences on a topic or details of a project they mentioned.
+
+        :param query: Keywords or a short question describing what to look for
+        :param k: Maximum number of memories to return
+        :param __user__: User dictionary containing the user ID
+        :param __event_emitter__: Optional event emitter for tracking status
+        :return: JSON string with the matching memories, their handles and scores
+        """
+        emitter = EventEmitter(__event_emitter__)
+
+        if not __user__:
+            message = "User ID not provided."
+            await emitter.emit(description=message, status="missing_user_id", done=True)
+            return json.dumps({"message": message}, ensure_ascii=False)
+
+        user_id = __user__.get("id")
+        if not user_id:
+            message = "User ID not provided."
+            await emitter.emit(description=message, status="missing_user_id", done=True)
+            return json.dumps({"message": message}, ensure_ascii=False)
+
+        await emitter.emit(
+            description="Searching stored memories.",
+            status="search_in_progress",
+            done=False,
+        )
+
+        index = await self._get_index(user_id)
+        hits = index.search(query, k)
+        handle_map = self._cache.handles(user_id, await self._get_memories(user_id))
+        if not hits:
+            message = "No relevant memory found."
+            await emitter.emit(description=message, status="search_complete", done=True)
+            return json.dumps({"message": message}, ensure_ascii=False)
+
+        await emitter.emit(
+            description=f"{len(hits)} relevant memories found",
+            status="search_complete",
+            done=True,
+        )
+        return json.dumps(
+            {
+                "memories": [
+                    {
+                        "handle": handle_map.handle(memory_id),
+                        "content": index.contents[memory_id],
+                        "score": round(score, 3),
+                    }
+                    for memory_id, score in hits
+                ]
+            },
+            ensure_ascii=False,
+        )
+
     async def add_memory(
         self,
         input_text: List[
@@ -200,21 +807,26 @@ class Tools:
             done=False,
         )
 
-        # Process each memory item
+        # Insert all items in one transaction
         added_items = []
         failed_items = []
 
-        for item in input_text:
-            new_memory = Memories.insert_new_memory(user_id, item)
-            if new_memory:
-                added_items.append(item)
-            else:
-                failed_items.append(item)
+        results = await self._run(insert_memories, user_id, input_text)
+        for item, result in zip(input_text, results):
+            if isinstance(result, str):
+                failed_items.append(f"{item}: {result}")
+                continue
+            added_items.append(item)
+            self._cache.add(user_id, result)
+            if user_id in self._indexes:
+                self._indexes[user_id].add(result)
 
         if not added_items:
             message = "Failed to add any memories."
             await emitter.emit(description=message, status="add_failed", done=True)
-            return json.dumps({"message": message}, ensure_ascii=False)
+            return json.dumps(
+                {"message": message, "failed": failed_items}, ensure_ascii=False
+            )
 
         # Prepare result message
         added_count = len(added_items)
@@ -232,11 +844,15 @@ class Tools:
             status="add_complete",
             done=True,
         )
-        return json.dumps({"message": message}, ensure_ascii=False)
+        result = {"message": message}
+        if failed_items:
+            result["failed"] = failed_items
+        return json.dumps(result, ensure_ascii=False)
 
     async def delete_memory(
         self,
-        indices: List[int],  # Modified to only accept list, items.type is integer
+        indices: List[int] = None,  # Only accepts list, items.type is integer
+        handles: List[str] = None,
         __user__: dict = None,
         __event_emitter__: Callable[[dict], Any] = None,
     ) -> str:
@@ -245,12 +861,13 @@ class Tools:
 
         Use to remove outdated or incorrect memories.
 
-        For single deletion: provide an integer index
-        For multiple deletions: provide a list of integer indices
-
-        Indices refer to the position in the sorted list (1-based).
+        Prefer handles: the bracketed codes shown by recall_memories, or the
+        handles returned by search_memories, e.g. ["3f2a9c1e"].
+        Indices refer to the position in the sorted list (1-based) and are
+        only a fallback when no handle is known.
 
-        :param indices: Single index (int) or list of indices to delete
+        :param indices: List of indices to delete
+        :param handles: List of memory handles to delete
         :param __user__: User dictionary containing the user ID
         :param __event_emitter__: Optional event emitter
         :return: JSON string with result message
@@ -268,56 +885,66 @@ class Tools:
             await emitter.emit(description=message, status="missing_user_id", done=True)
             return json.dumps({"message": message}, ensure_ascii=False)
 
-        # Handle single integer input if needed
+        # Handle single integer or string input if needed
         if isinstance(indices, int):
             indices = [indices]
+        if isinstance(handles, str):
+            handles = [handles]
+        handles = handles or []
+        indices = indices or []
 
         await emitter.emit(
-            description=f"Deleting {len(indices)} memory entries.",
+            description=f"Deleting {len(handles) + len(indices)} memory entries.",
             status="delete_in_progress",
             done=False,
         )
 
         # Get all memories for this user
-        user_memories = Memories.get_memories_by_user_id(user_id)
-        if not user_memories:
+        sorted_memories = await self._get_memories(user_id)
+        if not sorted_memories:
             message = "No memories found to delete."
             await emitter.emit(description=message, status="delete_failed", done=True)
             return json.dumps({"message": message}, ensure_ascii=False)
 
-        sorted_memories = sorted(user_memories, key=lambda m: m.created_at)
         responses = []
+        targets = []
+
+        for handle, memory in zip(handles, await self._resolve(user_id, handles)):
+            if isinstance(memory, str):
+                responses.append(memory)
+            else:
+                targets.append((len(responses), handle, memory))
+                responses.append(None)
 
         for index in indices:
             if index < 1 or index > len(sorted_memories):
-                message = f"Memory index {index} does not exist."
-                responses.append(message)
-                await emitter.emit(
-                    description=message, status="delete_failed", done=False
-                )
-                continue
-
-            # Get the memory by index (1-based index)
-            memory_to_delete = sorted_memories[index - 1]
-
-            # Delete the memory
-            result = Memories.delete_memory_by_id(memory_to_delete.id)
-            if not result:
-                message = f"Failed to delete memory at index {index}."
-                responses.append(message)
-                await emitter.emit(
-                    description=message, status="delete_failed", done=False
-                )
+                responses.append(f"Memory index {index} does not exist.")
             else:
-                message = f"Memory at index {index} deleted successfully."
-                responses.append(message)
-                await emitter.emit(
-                    description=message, status="delete_success", done=False
-                )
+                # Get the memory by index (1-based index)
+                memory = sorted_memories[index - 1]
+                targets.append((len(responses), f"at index {index}", memory))
+                responses.append(None)
+
+        # Delete all resolved memories in one transaction
+        results = (
+            await self._run(delete_memories, user_id, [m.id for _, _, m in targets])
+            if targets
+            else []
+        )
+        deleted = 0
+        for (position, label, memory), error in zip(targets, results):
+            if error:
+                responses[position] = f"Failed to delete memory {label}: {error}"
+                continue
+            deleted += 1
+            self._cache.remove(user_id, memory.id)
+            if user_id in self._indexes:
+                self._indexes[user_id].remove(memory.id)
+            responses[position] = f"Memory {label} deleted successfully."
 
         await emitter.emit(
-            description="All requested memory deletions have been processed.",
-            status="delete_complete",
+            description=f"Deleted {deleted} of {len(responses)} memory entries.",
+            status="delete_complete" if deleted else "delete_failed",
             done=True,
         )
         return json.dumps({"message": "\n".join(responses)}, ensure_ascii=False)
@@ -335,15 +962,18 @@ class Tools:
 
         Use to modify existing memories when information changes.
 
-        For single update: provide a dict with 'index' and 'content' keys
-        For multiple updates: provide a list of dicts with 'index' and 'content' keys
+        For single update: provide a dict with 'handle' and 'content' keys
+        For multiple updates: provide a list of dicts with 'handle' and 'content' keys
 
-        The 'index' refers to the position in the sorted list (1-based).
+        The 'handle' is the bracketed code shown by recall_memories or returned
+        by search_memories. An 'index', the position in the sorted list
+        (1-based), can be given instead as a fallback.
 
         Common scenarios: Correcting information, adding details,
         updating preferences, or refining wording.
 
-        :param updates: Dict with 'index' and 'content' keys OR a list of such dicts
+        :param updates: Dict with 'handle' (or 'index') and 'content' keys
+            OR a list of such dicts
         :param __user__: User dictionary containing the user ID
         :param __event_emitter__: Optional event emitter
         :return: JSON string with result message
@@ -361,6 +991,10 @@ class Tools:
             await emitter.emit(description=message, status="missing_user_id", done=True)
             return json.dumps({"message": message}, ensure_ascii=False)
 
+        # Handle a single update given without a list
+        if isinstance(updates, (dict, MemoryUpdate)):
+            updates = [updates]
+
         await emitter.emit(
             description=f"Updating {len(updates)} memory entries.",
             status="update_in_progress",
@@ -368,60 +1002,72 @@ class Tools:
         )
 
         # Get all memories for this user
-        user_memories = Memories.get_memories_by_user_id(user_id)
-        if not user_memories:
+        sorted_memories = await self._get_memories(user_id)
+        if not sorted_memories:
             message = "No memories found to update."
             await emitter.emit(description=message, status="update_failed", done=True)
             return json.dumps({"message": message}, ensure_ascii=False)
 
-        sorted_memories = sorted(user_memories, key=lambda m: m.created_at)
-        responses = []
+        responses = [None] * len(updates)
+        items = []
 
-        for update_item in updates:
+        for position, update_item in enumerate(updates):
             # Convert dict to MemoryUpdate object if needed
             if isinstance(update_item, dict):
                 try:
                     update_item = MemoryUpdate.parse_obj(update_item)
-                except Exception as e:
-                    message = f"Invalid update item format: {update_item}"
-                    responses.append(message)
-                    await emitter.emit(
-                        description=message, status="update_failed", done=False
-                    )
+                except Exception:
+                    responses[position] = f"Invalid update item format: {update_item}"
                     continue
-
-            index = update_item.index
-            content = update_item.content
-
-            if index < 1 or index > len(sorted_memories):
-                message = f"Memory index {index} does not exist."
-                responses.append(message)
-                await emitter.emit(
-                    description=message, status="update_failed", done=False
-                )
+            if update_item.handle is None and update_item.index is None:
+                responses[position] = f"Invalid update item format: {update_item}"
                 continue
+            items.append((position, update_item))
 
-            # Get the memory by index (1-based index)
-            memory_to_update = sorted_memories[index - 1]
-
-            # Update the memory
-            updated_memory = Memories.update_memory_by_id(memory_to_update.id, content)
-            if not updated_memory:
-                message = f"Failed to update memory at index {index}."
-                responses.append(message)
-                await emitter.emit(
-                    description=message, status="update_failed", done=False
-                )
+        targets = []
+        resolved = iter(
+            await self._resolve(
+                user_id, [item.handle for _, item in items if item.handle is not None]
+            )
+        )
+        for position, item in items:
+            if item.handle is not None:
+                memory = next(resolved)
+                label = item.handle
+                if isinstance(memory, str):
+                    responses[position] = memory
+                    continue
+            elif item.index < 1 or item.index > len(sorted_memories):
+                responses[position] = f"Memory index {item.index} does not exist."
+                continue
             else:
-                message = f"Memory at index {index} updated successfully."
-                responses.append(message)
-                await emitter.emit(
-                    description=message, status="update_success", done=False
-                )
+                # Get the memory by index (1-based index)
+                memory = sorted_memories[item.index - 1]
+                label = f"at index {item.index}"
+            targets.append((position, label, memory.id, item.content))
+
+        # Apply all resolved updates in one transaction
+        results = (
+            await self._run(
+                update_memories, user_id, [(i, c) for _, _, i, c in targets]
+            )
+            if targets
+            else []
+        )
+        updated = 0
+        for (position, label, _, _), result in zip(targets, results):
+            if isinstance(result, str):
+                responses[position] = f"Failed to update memory {label}: {result}"
+                continue
+            updated += 1
+            self._cache.update(user_id, result)
+            if user_id in self._indexes:
+                self._indexes[user_id].add(result)
+            responses[position] = f"Memory {label} updated successfully."
 
         await emitter.emit(
-            description="All requested memory updates have been processed.",
-            status="update_complete",
+            description=f"Updated {updated} of {len(updates)} memory entries.",
+            status="update_complete" if updated else "update_failed",
             done=True,
         )
         return json.dumps({"message": "\n".join(responses)}, ensure_ascii=False)